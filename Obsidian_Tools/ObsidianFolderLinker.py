@@ -6,53 +6,381 @@ Updated by : andrewslibin@gmail.com
 '''
 import os
 import re
-import os
-import re
+import json
+import time
+import argparse
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import FrozenSet, NamedTuple
+
+LINK_INDEX_FILE = os.path.join("output", "obsidian_folder_linker", "link_index.json")
+
+FENCE_PATTERN = re.compile(r'^\s*(```|~~~)')
+INLINE_CODE_PATTERN = re.compile(r'`[^`\n]*`')
+WIKILINK_PATTERN = re.compile(r'\[\[([^\[\]|#^]*)[^\[\]]*\]\]')
+ARCHIVE_HEADING_PATTERN = re.compile(r'^#{1,6}\s+Archive\b')
+
+
+class NoteLinks(NamedTuple):
+    """Link targets of a note and whether it already has an Archive heading."""
+    targets: FrozenSet[str]
+    has_archive: bool
+
+
+def parse_note_links(content):
+    """
+    Parses the wikilink targets and Archive heading of a markdown note.
+
+    Aliases ([[name|alias]]), headings ([[name#h]]), blocks ([[name#^id]]) and
+    embeds count as links to `name`; links inside fenced or inline code do not.
+    Path links ([[folder/name]]) also register their last component.
+    """
+    targets = set()
+    has_archive = False
+    fence = None
+    for line in content.splitlines():
+        match = FENCE_PATTERN.match(line)
+        if match:
+            if fence is None:
+                fence = match.group(1)
+            elif match.group(1) == fence:
+                fence = None
+            continue
+        if fence:
+            continue
+        if ARCHIVE_HEADING_PATTERN.match(line):
+            has_archive = True
+        for target in WIKILINK_PATTERN.findall(INLINE_CODE_PATTERN.sub('', line)):
+            target = target.strip()
+            if target.endswith('.md'):
+                target = target[:-3]
+            targets.add(target)
+            targets.add(target.rsplit('/', 1)[-1])
+    return NoteLinks(frozenset(targets), has_archive)
+
+
+class VaultLinkIndex:
+    """
+    Parsed links of every folder note, persisted between runs.
+
+    Entries are keyed by note path and only reused while the note keeps the
+    same mtime, so notes edited in Obsidian are parsed again.
+    """
+
+    def __init__(self, index_file=LINK_INDEX_FILE):
+        self.index_file = index_file
+        self.entries = {}
+        self.seen = set()
+        self._lock = threading.Lock()
+        if os.path.exists(index_file):
+            try:
+                with open(index_file, 'r', encoding='utf-8') as file:
+                    self.entries = json.load(file)
+            except (OSError, ValueError) as e:
+                print(f"Ignoring unreadable link index {index_file}: {e}")
+
+    def get(self, note_path):
+        """Returns the cached NoteLinks of an unchanged note, else None."""
+        with self._lock:
+            self.seen.add(note_path)
+            entry = self.entries.get(note_path)
+        if entry is None:
+            return None
+        try:
+            mtime_ns = os.stat(note_path).st_mtime_ns
+        except OSError:
+            return None
+        if entry['mtime_ns'] != mtime_ns:
+            return None
+        return NoteLinks(frozenset(entry['targets']), entry['has_archive'])
+
+    def put(self, note_path, note_links):
+        """Records the links of a note as it is on disk now."""
+        mtime_ns = os.stat(note_path).st_mtime_ns
+        with self._lock:
+            self.seen.add(note_path)
+            self.entries[note_path] = {
+                'mtime_ns': mtime_ns,
+                'targets': sorted(note_links.targets),
+                'has_archive': note_links.has_archive,
+            }
+
+    def save(self, prune=False):
+        """Writes the index; with prune, notes not visited in this run are dropped."""
+        with self._lock:
+            if prune:
+                self.entries = {path: entry for path, entry in self.entries.items() if path in self.seen}
+            os.makedirs(os.path.dirname(self.index_file) or '.', exist_ok=True)
+            tmp_file = f'{self.index_file}.tmp'
+            with open(tmp_file, 'w', encoding='utf-8') as file:
+                json.dump(self.entries, file)
+            os.replace(tmp_file, self.index_file)
+
 
 class ObsidianFolderLinker:
-    def __init__(self, file_path, directory):
+    def __init__(self, file_path, directory, index_file=LINK_INDEX_FILE):
         self.file_path = file_path
         self.directory = directory
         self.excluded_folders = [""]
+        self.link_index = VaultLinkIndex(index_file) if index_file else None
 
     def read_markdown_file(self, file_path):
         with open(file_path, 'r', encoding='utf-8') as file:
             content = file.read()
         return content
 
-    def read_all_folders(self, root, file_path):
+    def write_markdown_file(self, file_path, content):
+        """Writes a note via a temp file and rename, so sync never sees a half-written note."""
+        tmp_path = f'{file_path}.tmp'
+        with open(tmp_path, 'w') as file:
+            file.write(content)
+        os.replace(tmp_path, file_path)
+
+    def list_subfolders(self, root):
+        """Lists a folder once and returns its visible subfolder names in listing order."""
+        with os.scandir(root) as entries:
+            return [entry.name for entry in entries if not entry.name.startswith('.') and entry.is_dir()]
+
+    def update_folder_note(self, root, file_path):
+        """
+        Appends links to subfolders missing from one folder note.
+
+        Returns the (folder, note path) pairs of the subfolders to visit next.
+        """
+        dir_names = self.list_subfolders(root)
+        note_links = self.link_index.get(file_path) if self.link_index else None
+        if note_links is not None and all(dir_name in note_links.targets for dir_name in dir_names):
+            return self._children(root, dir_names)
+
         content = self.read_markdown_file(file_path) if os.path.exists(file_path) else ""
         content = content.strip()
         read_data = content
+        targets, has_archive = parse_note_links(content)
+        targets = set(targets)
 
-        for dir_name in os.listdir(root):
-            path = os.path.join(root, dir_name)
-            if dir_name.startswith('.') or os.path.isfile(path) or f'[[{dir_name}]]' in content:
+        for dir_name in dir_names:
+            if dir_name in targets:
                 continue
 
             print(f"Root: {dir_name}")
-            if not re.search("## Archive", content):
+            if not has_archive:
                 content += '  \n## Archive'
+                has_archive = True
             content += f'  \n[[{dir_name}]]'
+            targets.add(dir_name)
 
         if content != read_data or len(content) == 0:
-            with open(file_path, 'w') as file:
-                file.write(content)
+            self.write_markdown_file(file_path, content)
+        if self.link_index:
+            self.link_index.put(file_path, NoteLinks(frozenset(targets), has_archive))
+
+        return self._children(root, dir_names)
 
-        for dir_name in os.listdir(root):
+    def _children(self, root, dir_names):
+        """Returns the (folder, note path) pairs of the subfolders to visit."""
+        children = []
+        for dir_name in dir_names:
+            if dir_name in self.excluded_folders:
+                continue
             path = os.path.join(root, dir_name)
-            if dir_name.startswith('.') or os.path.isfile(path) or dir_name in self.excluded_folders:
+            children.append((path, os.path.join(path, f'{dir_name}.md')))
+        return children
+
+    def read_all_folders(self, root, file_path, workers=1):
+        """
+        Updates the note of `root` and of every folder below it.
+
+        Walks the vault with an explicit stack, so deep vaults cannot hit the
+        recursion limit. With more than one worker, independent subtrees are
+        processed on a thread pool; each note only depends on its own folder,
+        so the written notes are identical either way.
+        """
+        if workers <= 1:
+            stack = [(root, file_path)]
+            while stack:
+                folder, note_path = stack.pop()
+                stack.extend(reversed(self.update_folder_note(folder, note_path)))
+        else:
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                pending = {executor.submit(self.update_folder_note, root, file_path)}
+                while pending:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        for folder, note_path in future.result():
+                            pending.add(executor.submit(self.update_folder_note, folder, note_path))
+
+        if self.link_index:
+            self.link_index.save(prune=os.path.abspath(root) == os.path.abspath(self.directory))
+
+
+    def _scan_tree(self, root, file_path, snapshot):
+        """
+        Adds `root` and every folder below it to the watch snapshot.
+
+        Returns the {folder: note path} pairs that were added.
+        """
+        added = {}
+        stack = [(root, file_path)]
+        while stack:
+            folder, note_path = stack.pop()
+            try:
+                mtime_ns = os.stat(folder).st_mtime_ns
+                dir_names = self.list_subfolders(folder)
+            except OSError:
                 continue
-            sub_file_name = os.path.join(path, f'{dir_name}.md')
-            self.read_all_folders(path, sub_file_name)
+            snapshot[folder] = (mtime_ns, frozenset(dir_names), note_path)
+            added[folder] = note_path
+            stack.extend(self._children(folder, dir_names))
+        return added
 
+    def _poll_changes(self, snapshot, folders):
+        """
+        Re-lists the given folders whose mtime changed since the last poll.
+
+        Returns the {folder: note path} pairs whose set of subfolders changed,
+        including every folder of newly added subtrees.
+        """
+        changed = {}
+        for folder in folders:
+            if folder not in snapshot:
+                continue
+            old_mtime_ns, old_children, note_path = snapshot[folder]
+            try:
+                mtime_ns = os.stat(folder).st_mtime_ns
+                if mtime_ns == old_mtime_ns:
+                    continue
+                children = frozenset(self.list_subfolders(folder))
+            except OSError:
+                continue  # Removed; its parent reports the change.
+            snapshot[folder] = (mtime_ns, children, note_path)
+            if children == old_children:
+                continue
+
+            changed[folder] = note_path
+            for dir_name in old_children - children:
+                prefix = os.path.join(folder, dir_name)
+                for path in [path for path in snapshot if path == prefix or path.startswith(prefix + os.sep)]:
+                    del snapshot[path]
+            for path, child_note in self._children(folder, sorted(children - old_children)):
+                changed.update(self._scan_tree(path, child_note, snapshot))
+        return changed
+
+    def watch(self, interval=2.0, debounce=1.0, workers=1, use_inotify=True):
+        """
+        Keeps folder notes up to date until interrupted.
+
+        After one full pass, folders are watched for added or removed
+        subfolders (inotify when available, otherwise by polling mtimes) and
+        only the notes of affected folders are updated. Changes are debounced:
+        notes are written once no new change was seen for `debounce` seconds,
+        so a bulk copy results in a single write per note.
+        """
+        self.read_all_folders(self.directory, self.file_path, workers=workers)
+        snapshot = {}
+        self._scan_tree(self.directory, self.file_path, snapshot)
+        waiter = _InotifyWaiter.create() if use_inotify else None
+        print(f"Watching {len(snapshot)} folders ({'inotify' if waiter else 'polling'})")
+
+        dirty = {}
+        last_change = 0.0
+        try:
+            while True:
+                timeout = debounce if dirty else interval
+                if waiter:
+                    waiter.sync(snapshot)
+                    folders = waiter.wait(timeout)
+                else:
+                    time.sleep(timeout)
+                    folders = list(snapshot)
+
+                changed = self._poll_changes(snapshot, folders)
+                if changed:
+                    dirty.update(changed)
+                    last_change = time.monotonic()
+                elif dirty and time.monotonic() - last_change >= debounce:
+                    for folder in sorted(dirty):
+                        if os.path.isdir(folder):
+                            self.update_folder_note(folder, dirty[folder])
+                    print(f"Updated {len(dirty)} folder notes")
+                    dirty.clear()
+                    if self.link_index:
+                        self.link_index.save()
+        except KeyboardInterrupt:
+            print("Stopped watching")
+        finally:
+            if waiter:
+                waiter.close()
+            if self.link_index:
+                self.link_index.save()
+
+
+class _InotifyWaiter:
+    """Blocks until folders get subfolders created, removed or renamed (Linux only, via inotify_simple)."""
+
+    def __init__(self, inotify, mask):
+        self.inotify = inotify
+        self.mask = mask
+        self.watches = {}
+        self.paths = {}
+
+    @classmethod
+    def create(cls):
+        """Returns a waiter, or None when inotify is not available."""
+        try:
+            from inotify_simple import INotify, flags
+            inotify = INotify()
+        except (ImportError, OSError):
+            return None
+        mask = flags.CREATE | flags.DELETE | flags.MOVED_FROM | flags.MOVED_TO | flags.ONLYDIR
+        return cls(inotify, mask)
+
+    def sync(self, snapshot):
+        """Adds watches for new folders and drops those of removed ones."""
+        for folder in [folder for folder in self.watches if folder not in snapshot]:
+            wd = self.watches.pop(folder)
+            self.paths.pop(wd, None)
+            try:
+                self.inotify.rm_watch(wd)
+            except OSError:
+                pass
+        for folder in snapshot:
+            if folder not in self.watches:
+                try:
+                    wd = self.inotify.add_watch(folder, self.mask)
+                except OSError:
+                    continue
+                self.watches[folder] = wd
+                self.paths[wd] = folder
+
+    def wait(self, timeout):
+        """Returns the folders that reported events within `timeout` seconds."""
+        events = self.inotify.read(timeout=int(timeout * 1000))
+        return {self.paths[event.wd] for event in events if event.wd in self.paths}
+
+    def close(self):
+        self.inotify.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Link every Obsidian folder from its parent folder note.")
+    parser.add_argument("--root", default=r"C:\Obsidian_Data", help="Vault directory.")
+    parser.add_argument("--watch", action="store_true", help="Keep running and update notes as folders change.")
+    parser.add_argument("--interval", type=float, default=2.0, help="Seconds between polls in watch mode.")
+    parser.add_argument("--debounce", type=float, default=1.0, help="Quiet seconds before notes are written.")
+    args = parser.parse_args(argv)
 
-if __name__ == "__main__":
     # Specify the directory and file path
     file = "Home_Page.md"
-    root = r"C:\Obsidian_Data"
+    root = args.root
     file_path = os.path.join(root,file)
 
     # Instantiate the class and call the method
     processor = ObsidianFolderLinker(file_path, root)
-    processor.read_all_folders(root, file_path)
+    if args.watch:
+        processor.watch(interval=args.interval, debounce=args.debounce, workers=8)
+    else:
+        processor.read_all_folders(root, file_path, workers=8)
+
+
+if __name__ == "__main__":
+    main()
@@ -7,7 +7,26 @@ Updated by : andrewslibin@gmail.com
 
 import os
 import re
-from moviepy.editor import VideoFileClip
+import mmap
+import hashlib
+import sqlite3
+import struct
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import NamedTuple, Optional
+
+# Sentinel durations written by muxers that could not (or did not) know the
+# length up front, e.g. fragmented MP4s produced by live recorders.
+_UNKNOWN_DURATIONS = (0, 0xFFFFFFFF, 0xFFFFFFFFFFFFFFFF)
+_CONTAINER_BOXES = (b"moov", b"trak", b"mdia")
+
+CACHE_FILE = os.path.join("output", "mp4_to_list", "durations.sqlite")
+
+# One checklist entry as written by create_markdown_file, up to its separator.
+# Whitespace around the lines is optional so files whose trailing spaces
+# were trimmed by an editor still parse.
+_ENTRY_PATTERN = re.compile(
+    r"- \[(?P<mark>[ xX])\][^\n]*\n\s*```(?P<path>[^`\n]+)```[^\n]*\n[^\n]*\n\s*\*\*\*[ \t]*(?:\n[ \t]*)*"
+)
 
 
 def find_mf4_files(folder):
@@ -28,6 +47,147 @@ def find_mf4_files(folder):
     return mf4_files
 
 
+def _iter_boxes(read_at, start, end):
+    """
+    Yields (type, payload_start, box_end) for every ISO-BMFF box in a range.
+
+    Args:
+        read_at (callable): read_at(offset, size) -> bytes.
+        start (int): Offset of the first box header.
+        end (int): Offset where the range ends.
+    """
+    offset = start
+    while offset + 8 <= end:
+        header = read_at(offset, 16)
+        if len(header) < 8:
+            return
+        size, box_type = struct.unpack(">I4s", header[:8])
+        header_size = 8
+        if size == 1:
+            if len(header) < 16:
+                return
+            size = struct.unpack(">Q", header[8:16])[0]
+            header_size = 16
+        elif size == 0:
+            size = end - offset
+        if size < header_size or offset + size > end:
+            return
+        yield box_type, offset + header_size, offset + size
+        offset += size
+
+
+def _parse_time_header(payload):
+    """
+    Parses an mvhd/mdhd payload into (timescale, duration).
+
+    Both boxes share the same layout for the fields read here.
+    """
+    version = payload[0]
+    if version == 1:
+        timescale, duration = struct.unpack(">IQ", payload[20:32])
+    else:
+        timescale, duration = struct.unpack(">II", payload[12:20])
+    return timescale, duration
+
+
+def _read_header_duration(read_at, file_size):
+    """
+    Reads the duration from the moov/mvhd atom, falling back to the longest
+    trak/mdia/mdhd atom when the movie header does not carry one.
+
+    Returns:
+        float: The duration in seconds, or None if the header has none.
+    """
+    moov = None
+    for box_type, payload_start, box_end in _iter_boxes(read_at, 0, file_size):
+        if box_type == b"moov":
+            moov = (payload_start, box_end)
+            break
+    if moov is None:
+        return None
+
+    track_durations = []
+    stack = [moov]
+    while stack:
+        start, end = stack.pop()
+        for box_type, payload_start, box_end in _iter_boxes(read_at, start, end):
+            if box_type == b"mvhd":
+                timescale, duration = _parse_time_header(read_at(payload_start, 32))
+                if timescale and duration not in _UNKNOWN_DURATIONS:
+                    return duration / timescale
+            elif box_type == b"mdhd":
+                timescale, duration = _parse_time_header(read_at(payload_start, 32))
+                if timescale and duration not in _UNKNOWN_DURATIONS:
+                    track_durations.append(duration / timescale)
+            elif box_type in _CONTAINER_BOXES:
+                stack.append((payload_start, box_end))
+    return max(track_durations) if track_durations else None
+
+
+def _is_local_path(path):
+    """Returns False for UNC/network paths where mmap gives no benefit."""
+    return not os.path.abspath(path).startswith(("\\\\", "//"))
+
+
+def read_mp4_header_duration(mp4_file, use_mmap=None):
+    """
+    Returns the duration of an MP4 file from its container header only.
+
+    Local files are memory mapped; network paths are read with a handful of
+    small seeks, so only the box headers travel over the wire.
+
+    Args:
+        mp4_file (str): The path to the video file.
+        use_mmap (bool): Force (True) or disable (False) memory mapping.
+            Defaults to mapping local paths only.
+
+    Returns:
+        tuple: (duration in seconds or None, "mmap" or "header").
+    """
+    if use_mmap is None:
+        use_mmap = _is_local_path(mp4_file)
+    with open(mp4_file, "rb") as f:
+        file_size = os.fstat(f.fileno()).st_size
+        if use_mmap and file_size:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                return _read_header_duration(lambda offset, size: mm[offset:offset + size], file_size), "mmap"
+
+        def read_at(offset, size):
+            f.seek(offset)
+            return f.read(size)
+
+        return _read_header_duration(read_at, file_size), "header"
+
+
+def probe_video_length(mp4_file):
+    """
+    Returns the duration of a video file and the path used to obtain it.
+
+    The MP4 header is tried first; moviepy is only used for broken or
+    fragmented files whose header carries no usable duration.
+
+    Args:
+        mp4_file (str): The path to the video file.
+
+    Returns:
+        tuple: (duration in seconds, "mmap" | "header" | "moviepy").
+    """
+    try:
+        duration, source = read_mp4_header_duration(mp4_file)
+        if duration is not None:
+            return duration, source
+    except (OSError, ValueError, struct.error):
+        pass
+
+    from moviepy.editor import VideoFileClip
+
+    clip = VideoFileClip(mp4_file)
+    try:
+        return clip.duration, "moviepy"
+    finally:
+        clip.close()
+
+
 def get_video_length(mp4_file):
     """
     Returns the duration of a video file in seconds.
@@ -38,69 +198,419 @@ def get_video_length(mp4_file):
     Returns:
         float: The duration of the video in seconds.
     """
-    clip = VideoFileClip(mp4_file)
-    video_length = clip.duration
+    video_length, _ = probe_video_length(mp4_file)
     return video_length
 
 
-import re
+class ProbeResult(NamedTuple):
+    """Outcome of probing a single video file."""
+
+    file_path: str
+    duration: Optional[float]
+    source: Optional[str]
+    error: Optional[str]
+
+
+def _probe_worker(mp4_file):
+    """
+    Probes one file and never raises, so a broken file cannot stall the pool.
+
+    Kept at module level so it can be pickled for a process pool.
+    """
+    try:
+        duration, source = probe_video_length(mp4_file)
+        return ProbeResult(mp4_file, duration, source, None)
+    except Exception as e:
+        return ProbeResult(mp4_file, None, None, f"{type(e).__name__}: {e}")
+
+
+def probe_videos(mp4_files, workers=8, use_processes=False):
+    """
+    Probes video durations on a worker pool.
+
+    Results are yielded as soon as they are available but always in the order
+    of `mp4_files`, so the generated markdown is deterministic.
+
+    Args:
+        mp4_files (list): Paths of the video files to probe.
+        workers (int): Number of pool workers. 1 probes inline.
+        use_processes (bool): Use a process pool instead of threads. Threads
+            are the better fit for network shares, where probing is mostly
+            I/O wait.
+
+    Yields:
+        ProbeResult: One result per input path.
+    """
+    if workers <= 1:
+        for mp4_file in mp4_files:
+            yield _probe_worker(mp4_file)
+        return
+
+    executor_cls = ProcessPoolExecutor if use_processes else ThreadPoolExecutor
+    with executor_cls(max_workers=workers) as executor:
+        futures = [executor.submit(_probe_worker, mp4_file) for mp4_file in mp4_files]
+        for future in futures:
+            yield future.result()
+
+
+def _partial_hash(mp4_file, chunk_size):
+    """
+    Hashes the first and last `chunk_size` bytes of a file via mmap.
+
+    Files of at most 2 * `chunk_size` bytes are hashed in full.
+    """
+    digest = hashlib.blake2b()
+    with open(mp4_file, "rb") as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            size = len(mm)
+            if size <= 2 * chunk_size:
+                digest.update(mm)
+            else:
+                digest.update(mm[:chunk_size])
+                digest.update(mm[size - chunk_size:])
+    return digest.hexdigest()
+
+
+def _full_hash(mp4_file, block_size=8 * 1024 * 1024):
+    """Hashes the whole file via mmap, one block at a time."""
+    digest = hashlib.blake2b()
+    with open(mp4_file, "rb") as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            for offset in range(0, len(mm), block_size):
+                digest.update(mm[offset:offset + block_size])
+    return digest.hexdigest()
+
+
+def _group_by(paths, key_func, workers, cache=None, kind=None):
+    """
+    Groups paths by key_func(path), dropping groups of one and unreadable files.
+
+    With a `cache`, keys stored under `kind` for unchanged files are reused
+    and newly computed keys are stored; cache access stays on this thread.
+    """
+    def safe_key(path):
+        try:
+            return key_func(path)
+        except (OSError, ValueError) as e:
+            print(f"Skipping {path} in duplicate check: {e}")
+            return None
+
+    keys = {}
+    stats = {}
+    if cache is not None:
+        for path in paths:
+            try:
+                stats[path] = os.stat(path)
+            except OSError:
+                continue
+            cached = cache.get_hash(path, stats[path], kind)
+            if cached is not None:
+                keys[path] = cached
+    missing = [path for path in paths if path not in keys]
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        keys.update(zip(missing, executor.map(safe_key, missing)))
+    if cache is not None:
+        for path in missing:
+            if keys[path] is not None and path in stats:
+                cache.put_hash(path, stats[path], kind, keys[path])
+        cache.commit()
+
+    groups = {}
+    for path in paths:
+        if keys[path] is not None:
+            groups.setdefault(keys[path], []).append(path)
+    return [group for group in groups.values() if len(group) > 1]
 
 
-def create_markdown_file(mf4_file_paths, out_dict, markdown_file_path):
+def find_duplicate_videos(mp4_files, chunk_size=1024 * 1024, workers=8, cache=None):
+    """
+    Finds files with identical content using staged hashing.
+
+    Files are bucketed by size first; only same-sized files have their first
+    and last chunk hashed, and only files whose partial hashes match are
+    hashed in full. Files small enough for the partial hash to cover them
+    entirely are never hashed twice.
+
+    Args:
+        mp4_files (list): Paths of the video files to compare.
+        chunk_size (int): Bytes hashed at each end of a file.
+        workers (int): Number of threads used for hashing.
+        cache (DurationCache): Optional cache; partial and full hashes of
+            unchanged files are read from it instead of the disk.
+
+    Returns:
+        list: Groups of duplicate paths; each group keeps the input order.
+    """
+    size_groups = _group_by(mp4_files, lambda path: os.path.getsize(path) or None, workers)
+
+    duplicates = []
+    for size_group in size_groups:
+        partial_groups = _group_by(
+            size_group, lambda path: _partial_hash(path, chunk_size), workers, cache, f"partial:{chunk_size}"
+        )
+        for partial_group in partial_groups:
+            if os.path.getsize(partial_group[0]) <= 2 * chunk_size:
+                duplicates.append(partial_group)
+            else:
+                duplicates.extend(_group_by(partial_group, _full_hash, workers, cache, "full"))
+    return duplicates
+
+
+def dedupe_videos(mp4_files, chunk_size=1024 * 1024, workers=8, cache=None):
+    """
+    Splits `mp4_files` into a de-duplicated listing and duplicate groups.
+
+    The first path of every duplicate group is kept in the listing.
+
+    Returns:
+        tuple: (unique paths in input order, duplicate groups).
+    """
+    duplicates = find_duplicate_videos(mp4_files, chunk_size=chunk_size, workers=workers, cache=cache)
+    dropped = {path for group in duplicates for path in group[1:]}
+    return [path for path in mp4_files if path not in dropped], duplicates
+
+
+def write_duplicate_report(duplicates, report_path):
+    """
+    Writes a markdown report of duplicate video groups.
+
+    Parameters:
+        duplicates (list): Groups as returned by `find_duplicate_videos`.
+        report_path (str): Path to the markdown report to be created.
+    """
+    with open(report_path, "wb") as report:
+        report.write("# DUPLICATE_MP4_FILES \n\n".encode("utf-8"))
+        for group in duplicates:
+            size_mb = os.path.getsize(group[0]) / (1024 * 1024)
+            report.write(f"## {os.path.basename(group[0])} ({size_mb:.1f} MB) \n".encode("utf-8"))
+            report.write(f"- kept ```{group[0]}``` \n".encode("utf-8"))
+            for path in group[1:]:
+                report.write(f"- duplicate ```{path}``` \n".encode("utf-8"))
+            report.write(" \n".encode("utf-8"))
+
+
+class DurationCache:
+    """
+    SQLite cache of probed durations and content hashes keyed by path, size
+    and mtime.
+
+    An entry is only reused while the file keeps the same size and mtime, so
+    replaced or re-encoded videos are probed and hashed again.
+    """
+
+    def __init__(self, db_path=CACHE_FILE):
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        self.db_path = db_path
+        self.conn = sqlite3.connect(db_path)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS durations ("
+            "path TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER, duration REAL, source TEXT)"
+        )
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS hashes ("
+            "path TEXT, kind TEXT, size INTEGER, mtime_ns INTEGER, digest TEXT, PRIMARY KEY (path, kind))"
+        )
+
+    def get(self, file_path, stat_result):
+        """Returns the cached duration for an unchanged file, else None."""
+        row = self.conn.execute(
+            "SELECT duration FROM durations WHERE path = ? AND size = ? AND mtime_ns = ?",
+            (file_path, stat_result.st_size, stat_result.st_mtime_ns),
+        ).fetchone()
+        return row[0] if row else None
+
+    def put(self, file_path, stat_result, duration, source):
+        """Stores the duration probed for a file."""
+        self.conn.execute(
+            "INSERT OR REPLACE INTO durations VALUES (?, ?, ?, ?, ?)",
+            (file_path, stat_result.st_size, stat_result.st_mtime_ns, duration, source),
+        )
+
+    def get_hash(self, file_path, stat_result, kind):
+        """Returns the cached hash of `kind` for an unchanged file, else None."""
+        row = self.conn.execute(
+            "SELECT digest FROM hashes WHERE path = ? AND kind = ? AND size = ? AND mtime_ns = ?",
+            (file_path, kind, stat_result.st_size, stat_result.st_mtime_ns),
+        ).fetchone()
+        return row[0] if row else None
+
+    def put_hash(self, file_path, stat_result, kind, digest):
+        """Stores a content hash computed for a file."""
+        self.conn.execute(
+            "INSERT OR REPLACE INTO hashes VALUES (?, ?, ?, ?, ?)",
+            (file_path, kind, stat_result.st_size, stat_result.st_mtime_ns, digest),
+        )
+
+    def prune(self, existing_paths):
+        """
+        Removes entries for files that no longer exist.
+
+        Args:
+            existing_paths (iterable): Paths found by the current scan.
+
+        Returns:
+            int: Number of removed entries.
+        """
+        existing = set(existing_paths)
+        stale = [(path,) for (path,) in self.conn.execute("SELECT path FROM durations") if path not in existing]
+        self.conn.executemany("DELETE FROM durations WHERE path = ?", stale)
+        stale_hashes = {(path,) for (path,) in self.conn.execute("SELECT path FROM hashes") if path not in existing}
+        self.conn.executemany("DELETE FROM hashes WHERE path = ?", stale_hashes)
+        self.conn.commit()
+        return len(stale)
+
+    def commit(self):
+        self.conn.commit()
+
+    def close(self):
+        self.conn.commit()
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def probe_videos_cached(mp4_files, cache, workers=8, use_processes=False):
+    """
+    Same as `probe_videos`, but serves unchanged files from `cache` and only
+    sends new or modified files to the worker pool.
+
+    Yields:
+        ProbeResult: One result per input path, in input order. Cached
+        results report "cache" as their source.
+    """
+    stats = {}
+    cached = {}
+    for mp4_file in mp4_files:
+        try:
+            stats[mp4_file] = os.stat(mp4_file)
+        except OSError:
+            continue
+        duration = cache.get(mp4_file, stats[mp4_file])
+        if duration is not None:
+            cached[mp4_file] = duration
+
+    pending = [mp4_file for mp4_file in mp4_files if mp4_file not in cached]
+    probed = probe_videos(pending, workers=workers, use_processes=use_processes)
+    for mp4_file in mp4_files:
+        if mp4_file in cached:
+            yield ProbeResult(mp4_file, cached[mp4_file], "cache", None)
+            continue
+        result = next(probed)
+        if not result.error and mp4_file in stats:
+            cache.put(mp4_file, stats[mp4_file], result.duration, result.source)
+        yield result
+    cache.commit()
+
+
+def read_markdown_entries(markdown_file_path):
+    """
+    Parses an existing ALL_MP4_FILES.md.
+
+    Returns:
+        dict: File path -> (checked, entry block), in file order. Missing
+        files yield an empty dict. A warning is printed when an existing
+        file has no parseable entries, since every entry is then rewritten
+        unticked.
+    """
+    if not os.path.exists(markdown_file_path):
+        return {}
+    with open(markdown_file_path, "rb") as md_file:
+        content = md_file.read().decode("utf-8")
+    entries = {}
+    for match in _ENTRY_PATTERN.finditer(content):
+        block = match.group(0).strip() + " \n \n "
+        entries[match.group("path").strip()] = (match.group("mark") in "xX", block)
+    if not entries and content.replace("# ALL_MP4_FILES", "").strip():
+        print(f"Warning: no entries could be parsed from {markdown_file_path}; checkbox state is not kept")
+    return entries
+
+
+def _format_entry(file_name, file_path, duration, checked=False):
+    """Formats one checklist entry of ALL_MP4_FILES.md."""
+    pattern = r"[^a-zA-Z0-9\s]"
+    name = re.sub(pattern, "", file_name)
+    mark = "x" if checked else " "
+    return (
+        f"- [{mark}] {int(duration/60)} Min_{name} \n \n ```{file_path}```     \n"
+        f"![[{file_name}.mp4]] \n \n *** \n \n "
+    )
+
+
+def create_markdown_file(
+    mf4_file_paths, out_dict, markdown_file_path, workers=8, use_processes=False, cache=None, incremental=False
+):
     """
     Creates a markdown file with a list of MP4 files and their durations.
 
     Parameters:
         mf4_file_paths (list): List of file paths of MP4 files.
-        out_dict (dict): Dictionary of file names and file paths.
+        out_dict (dict): Dictionary of file paths and display names.
         markdown_file_path (str): Path to the markdown file to be created.
+        workers (int): Number of parallel probe workers.
+        use_processes (bool): Probe on a process pool instead of threads.
+        cache (DurationCache): Optional duration cache; only new or changed
+            files are probed when given.
+        incremental (bool): Merge into the existing markdown file, keeping
+            its entry order and checkbox state. New files are appended and
+            entries of deleted files are dropped.
     """
+    names = out_dict
+    existing = read_markdown_entries(markdown_file_path) if incremental else {}
+    ordered_paths = [path for path in existing if path in names]
+    ordered_paths += [path for path in names if path not in existing]
+
+    if cache is not None:
+        results = probe_videos_cached(ordered_paths, cache, workers=workers, use_processes=use_processes)
+    else:
+        results = probe_videos(ordered_paths, workers=workers, use_processes=use_processes)
 
-    with open(markdown_file_path, "wb") as md_file:
+    tmp_path = f"{markdown_file_path}.tmp"
+    with open(tmp_path, "wb") as md_file:
         md_file.write("# ALL_MP4_FILES \n\n".encode("utf-8"))
         total = len(mf4_file_paths)
-        n = 0
-        for file_name, file_path in out_dict.items():
-            n += 1
-            try:
-                length = get_video_length(file_path)
-                pattern = r"[^a-zA-Z0-9\s]"
-                file_name = re.sub(pattern, "", file_name)
-                md_file.write(
-                    f"- [ ] {int(length/60)} Min_{file_name} \n ```{file_path}```     \n".encode(
-                        "utf-8"
-                    )
-                )
-                print(f"{n}/{total} completed file - {file_name}")
-            except Exception as e:
-                print(e)
-
-
-# Example usage
-folder_path = "C:\data_home"
-markdown_file_path = os.path.join(folder_path, "ALL_MP4_FILES.md")
-mf4_file_paths = find_mf4_files(folder_path)
-out_dict = {}
-for file in mf4_file_paths:
-    out_dict[os.path.basename(file).replace(".mp4", "")] = file
-
-with open(markdown_file_path, "wb") as md_file:
-    md_file.write("# ALL_MP4_FILES \n\n".encode("utf-8"))
-    total = len(mf4_file_paths)
-    n = 0
-    for file_name, file_path in out_dict.items():
-        n += 1
-        try:
-            length = get_video_length(file_path)
-            pattern = r"[^a-zA-Z0-9\s]"
-            name = re.sub(pattern, "", file_name)
-            md_file.write(
-                f"- [ ] {int(length/60)} Min_{name} \n \n ```{file_path}```     \n".encode(
-                    "utf-8"
-                )
-            )
-            md_file.write(f"![[{file_name}.mp4]] \n \n *** \n \n ".encode("utf-8"))
-            print(f"{n}/{total} completed file - {file_name}")
-        except Exception as e:
-            print(e)
-print(markdown_file_path)
+        for n, result in enumerate(results, start=1):
+            file_name = names[result.file_path]
+            checked, old_block = existing.get(result.file_path, (False, None))
+            if result.error:
+                print(f"{n}/{total} failed file - {file_name}: {result.error}")
+                if old_block:
+                    md_file.write(old_block.encode("utf-8"))
+                continue
+            md_file.write(_format_entry(file_name, result.file_path, result.duration, checked).encode("utf-8"))
+            print(f"{n}/{total} completed file ({result.source}) - {file_name}")
+    os.replace(tmp_path, markdown_file_path)
+
+
+def main(incremental=True):
+    """Example usage: lists every MP4 under `folder_path` in ALL_MP4_FILES.md."""
+    folder_path = r"C:\data_home"
+    markdown_file_path = os.path.join(folder_path, "ALL_MP4_FILES.md")
+    mf4_file_paths = find_mf4_files(folder_path)
+
+    with DurationCache() as cache:
+        pruned = cache.prune(mf4_file_paths)
+        if pruned:
+            print(f"Pruned {pruned} cached durations of deleted files")
+        unique_paths, duplicates = dedupe_videos(mf4_file_paths, cache=cache)
+        if duplicates:
+            report_path = os.path.join(folder_path, "DUPLICATE_MP4_FILES.md")
+            write_duplicate_report(duplicates, report_path)
+            print(f"{len(mf4_file_paths) - len(unique_paths)} duplicate files listed in {report_path}")
+
+        # Keyed by path: same-named files in different folders are both listed.
+        out_dict = {}
+        for file in unique_paths:
+            out_dict[file] = os.path.basename(file).replace(".mp4", "")
+
+        create_markdown_file(
+            unique_paths, out_dict, markdown_file_path, workers=8, cache=cache, incremental=incremental
+        )
+    print(markdown_file_path)
+
+
+if __name__ == "__main__":
+    main()
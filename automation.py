@@ -0,0 +1,130 @@
+# -*- coding: utf-8 -*-
+"""
+Author: Libin Andrews
+
+Single entry point for all automation tools.
+
+Usage:
+    python automation.py <command> [tool arguments]
+    python automation.py --import-time <command>
+
+Commands are registered by file path only. A tool module, and with it heavy
+libraries such as pandas, moviepy or pygame, is imported only when its command
+runs, so e.g. `automation.py leave-time` starts about as fast as the tool itself.
+`--import-time` imports the command's tool in a fresh `python -X importtime`
+without running it, prints the slowest imports and fails when the startup
+budget is exceeded.
+"""
+import os
+import sys
+import argparse
+import importlib.util
+
+ROOT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# command -> (tool script relative to ROOT_DIR, help text)
+COMMANDS = {
+    "leave-time": ("leave_time_calculator.py", "Show leave times and time since log-in."),
+    "aae-cleanup": ("remove_AAE_Files.py", "Delete Apple .AAE sidecar files."),
+    "yt-playlist": ("yt_playlist_to_md.py", "Export a YouTube playlist to a Markdown checklist."),
+    "mp4-list": ("Obsidian_Tools/mp4_to_list.py", "List MP4 files with durations in ALL_MP4_FILES.md."),
+    "folder-linker": ("Obsidian_Tools/ObsidianFolderLinker.py", "Link Obsidian folders from their parent notes."),
+    "todoist": ("todo_ist.py", "Download, sync or create Todoist tasks."),
+    "breathe": ("breathing_exercise.py", "Run the guided 4-7-8 breathing exercise."),
+    "requirements": ("create_requirements_file.py", "Write requirements.txt for an interpreter."),
+}
+
+# Import time allowed before a command starts doing work, checked by --import-time.
+STARTUP_BUDGET_MS = 300
+
+
+def load_tool(command: str):
+    """Imports the module behind a command from its file path."""
+    relative_path, _ = COMMANDS[command]
+    path = os.path.join(ROOT_DIR, relative_path)
+    module_name = os.path.splitext(os.path.basename(path))[0]
+    if module_name in sys.modules:
+        return sys.modules[module_name]
+
+    # Tools import their siblings by plain module name, as when run as scripts.
+    tool_dir = os.path.dirname(path)
+    if tool_dir not in sys.path:
+        sys.path.insert(0, tool_dir)
+    spec = importlib.util.spec_from_file_location(module_name, path)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[module_name] = module  # Needed for pickling, e.g. process pools
+    spec.loader.exec_module(module)
+    return module
+
+
+def run_command(command: str, args: list):
+    """Runs a tool's main() with `args` as its command line."""
+    module = load_tool(command)
+    sys.argv = [f"automation {command}", *args]
+    return module.main()
+
+
+def import_time_report(command: str, budget_ms: float = STARTUP_BUDGET_MS, top: int = 15) -> int:
+    """
+    Imports a command's tool in a fresh interpreter with -X importtime and reports the slowest imports.
+
+    The tool's main() is not run, so measuring never creates tasks or deletes files.
+    Returns 0 when the total import time is within `budget_ms`, else 1.
+    """
+    import subprocess
+    import time
+
+    started = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import automation; automation.load_tool({command!r})"],
+        stderr=subprocess.PIPE, text=True, cwd=ROOT_DIR,
+    )
+    wall_ms = (time.perf_counter() - started) * 1000
+
+    top_level = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:"):
+            sys.stderr.write(line + "\n")
+            continue
+        fields = line[len("import time:"):].split("|")
+        if len(fields) != 3 or not fields[0].strip().isdigit():
+            continue  # Header line
+        name = fields[2].rstrip()
+        if name.startswith("  "):
+            continue  # Imported by another module; already part of its cumulative time
+        top_level.append((int(fields[1]) / 1000, name.strip()))
+
+    total_ms = sum(cumulative for cumulative, _ in top_level)
+    print(f"\nSlowest top-level imports for '{command}':")
+    for cumulative, name in sorted(top_level, reverse=True)[:top]:
+        print(f"  {cumulative:8.1f} ms  {name}")
+    print(f"Total import time: {total_ms:.1f} ms (budget {budget_ms:.0f} ms), wall time: {wall_ms:.1f} ms")
+    if total_ms > budget_ms:
+        print("Import time budget exceeded.")
+        return 1
+    return result.returncode
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="automation",
+        description="Run one of the automation tools.",
+        epilog="\n".join(f"  {name:<14} {help_text}" for name, (_, help_text) in COMMANDS.items()),
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    parser.add_argument("--import-time", action="store_true",
+                        help="Report import times of the command and check them against the startup budget.")
+    parser.add_argument("--budget-ms", type=float, default=STARTUP_BUDGET_MS,
+                        help=f"Startup import budget for --import-time (default: {STARTUP_BUDGET_MS} ms).")
+    parser.add_argument("command", choices=COMMANDS, metavar="command", help="Tool to run (see below).")
+    parser.add_argument("args", nargs=argparse.REMAINDER, help="Arguments passed to the tool.")
+    args = parser.parse_args(argv)
+
+    if args.import_time:
+        return import_time_report(args.command, args.budget_ms)
+    result = run_command(args.command, args.args)
+    return result if isinstance(result, int) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,90 +1,582 @@
 import os
+import csv
+import json
 import time
+import wave
+import argparse
+import queue
+import shutil
+import hashlib
 import threading
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from collections import OrderedDict, deque
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Tuple
 import pygame
-from gtts import gTTS
 from abc import ABC, abstractmethod
 
 
 OUTPUT_FOLDER = "output/breathexercise"
-os.makedirs(OUTPUT_FOLDER, exist_ok=True)  # Ensure directory exists
+PHRASE_FOLDER = os.path.join(OUTPUT_FOLDER, "phrases")
+
+WELCOME_MESSAGE = ("Welcome to your guided breathing exercise. "
+                   "Sit comfortably with your back straight and relax your shoulders.")
+TECHNIQUE_MESSAGE = "We will use the 4-7-8 breathing technique, known to reduce stress and promote relaxation."
+INTRO_PAUSE = 2.0  # Seconds of silence after each introduction message
+
+TIMING_LOG_FILE = os.path.join(OUTPUT_FOLDER, "timing_log.csv")
+SPIN_INTERVAL = 0.002  # The last part of every wait is spun instead of slept
+SESSION_FOLDER = os.path.join(OUTPUT_FOLDER, "sessions")
+
+# Utterance kind -> (mixer channel, rule). "preempt" stops whatever plays on the channel and
+# drops anything waiting, so a countdown number is never late; "queue" plays after the
+# utterances already waiting on the channel, so instructions are never cut off.
+CHANNEL_RULES = {
+    "instruction": (0, "queue"),
+    "countdown": (1, "preempt"),
+}
 
 
 class TextToSpeech(ABC):
     """Abstract base class for text-to-speech conversion."""
 
     @abstractmethod
-    def speak(self, text: str) -> float:
+    def speak(self, text: str, kind: str = "instruction") -> float:
         pass
 
     @abstractmethod
-    def speak_async(self, text: str) -> float:
+    def speak_async(self, text: str, kind: str = "instruction") -> float:
+        pass
+
+    @abstractmethod
+    def play(self, text: str, kind: str = "instruction") -> "PlaybackRequest":
+        """Starts speaking text without waiting; the request records when playback really started."""
+
+    @abstractmethod
+    def clip_duration(self, text: str) -> float:
+        """Length in seconds of the spoken text."""
+
+    def prefetch(self, texts: Iterable[str]) -> None:
+        """Prepares the given phrases before a session; optional for implementations."""
+
+    @abstractmethod
+    def clip_samples(self, text: str) -> Tuple["numpy.ndarray", int]:
+        """Decoded 16-bit samples (frames x channels) of the spoken text and their sample rate."""
+
+    @abstractmethod
+    def clip_key(self, text: str) -> str:
+        """Identifies the clip the text is spoken with, e.g. its phrase cache key."""
+
+
+class SpeechEngine(ABC):
+    """Renders a phrase to an audio file."""
+    name = ""
+    extension = ""
+
+    @abstractmethod
+    def render(self, text: str, audio_path: str) -> None:
+        pass
+
+    def settings(self) -> Dict[str, object]:
+        """Everything besides the text that changes the rendered audio; part of the phrase cache key."""
+        return {}
+
+
+class GTTSEngine(SpeechEngine):
+    """Google Text-to-Speech; needs network access."""
+    name = "gtts"
+    extension = "mp3"
+
+    def __init__(self, lang: str = "en") -> None:
+        self.lang = lang
+
+    def render(self, text: str, audio_path: str) -> None:
+        from gtts import gTTS  # Only needed for phrases that are not cached yet
+
+        gTTS(text=text, lang=self.lang, slow=False).save(audio_path)
+
+    def settings(self) -> Dict[str, object]:
+        return {"lang": self.lang}
+
+
+class EspeakEngine(SpeechEngine):
+    """Local espeak-ng / espeak command line synthesizer."""
+    name = "espeak"
+    extension = "wav"
+
+    def __init__(self, voice: str = "en", words_per_minute: int = 150) -> None:
+        self.executable = shutil.which("espeak-ng") or shutil.which("espeak")
+        if not self.executable:
+            raise RuntimeError("Neither espeak-ng nor espeak was found on PATH.")
+        self.voice = voice
+        self.words_per_minute = words_per_minute
+
+    def render(self, text: str, audio_path: str) -> None:
+        subprocess.run([self.executable, "-v", self.voice, "-s", str(self.words_per_minute), "-w", audio_path, text],
+                       check=True, capture_output=True)
+
+    def settings(self) -> Dict[str, object]:
+        return {"executable": os.path.basename(self.executable), "voice": self.voice,
+                "words_per_minute": self.words_per_minute}
+
+
+class Pyttsx3Engine(SpeechEngine):
+    """Local pyttsx3 synthesizer (SAPI5, NSSpeechSynthesizer or espeak, depending on the platform)."""
+    name = "pyttsx3"
+    extension = "wav"
+
+    def __init__(self) -> None:
+        import pyttsx3  # Optional offline engine
+
+        # SAPI5 (COM) and NSSpeechSynthesizer engines only work on the thread that created
+        # them, so the engine lives on one dedicated thread and every render runs there.
+        self._thread = ThreadPoolExecutor(max_workers=1, thread_name_prefix="pyttsx3")
+        self._engine = self._thread.submit(pyttsx3.init).result()
+        self._settings = self._thread.submit(
+            lambda: {"voice": self._engine.getProperty("voice"), "rate": self._engine.getProperty("rate")}
+        ).result()
+
+    def _render(self, text: str, audio_path: str) -> None:
+        self._engine.save_to_file(text, audio_path)
+        self._engine.runAndWait()
+
+    def render(self, text: str, audio_path: str) -> None:
+        self._thread.submit(self._render, text, audio_path).result()
+
+    def settings(self) -> Dict[str, object]:
+        return self._settings
+
+
+def local_engine() -> SpeechEngine:
+    """Returns the first available offline engine: espeak, then pyttsx3."""
+    try:
+        return EspeakEngine()
+    except RuntimeError:
         pass
+    try:
+        return Pyttsx3Engine()
+    except Exception as e:
+        raise RuntimeError(f"No offline speech engine available (install espeak-ng or pyttsx3): {e}")
 
 
-class GTTSpeech(TextToSpeech):
+class PhraseCache:
     """
-    Implementation of TextToSpeech using gTTS and pygame.
-    - Uses offline MP3 caching for repeated phrases.
+    On-disk cache of rendered phrases, keyed by a hash of engine, engine settings and text.
+
+    A JSON manifest records text, size and last use of every clip; when the clips exceed
+    `max_bytes`, the least recently used ones are deleted.
     """
 
-    def __init__(self) -> None:
-        pygame.mixer.init()
+    def __init__(self, folder: str = PHRASE_FOLDER, max_bytes: int = 50 * 1024 * 1024) -> None:
+        self.folder = folder
+        self.max_bytes = max_bytes
+        self.manifest_file = os.path.join(folder, "manifest.json")
+        self._lock = threading.Lock()
+        os.makedirs(folder, exist_ok=True)
+        try:
+            with open(self.manifest_file, "r", encoding="utf-8") as f:
+                entries = json.load(f)
+        except (OSError, ValueError):
+            entries = {}
+        self.entries = {key: entry for key, entry in entries.items()
+                        if os.path.exists(os.path.join(folder, entry["file"]))}
 
-    def _get_audio_path(self, text: str) -> str:
-        """Generate a consistent filename based on the text content."""
-        sanitized_text = "".join(c if c.isalnum() or c.isspace() else "_" for c in text)
-        filename = f"{sanitized_text[:50]}.mp3"  # Trim long names
-        return os.path.join(OUTPUT_FOLDER, filename)
+    @staticmethod
+    def key(engine: SpeechEngine, text: str) -> str:
+        settings = json.dumps(engine.settings(), sort_keys=True, default=str)
+        return hashlib.sha256(f"{engine.name}|{settings}|{text}".encode("utf-8")).hexdigest()[:32]
 
-    def _generate_audio(self, text: str) -> str:
-        """Generate and save an audio file for offline use."""
-        audio_path = self._get_audio_path(text)
-        if not os.path.exists(audio_path):
-            tts = gTTS(text=text, lang='en', slow=False)
-            tts.save(audio_path)
+    def get(self, engine: SpeechEngine, text: str) -> Optional[str]:
+        """Path of the cached clip, or None."""
+        key = self.key(engine, text)
+        with self._lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            entry["last_used"] = time.time()
+            return os.path.join(self.folder, entry["file"])
+
+    def render(self, engine: SpeechEngine, text: str) -> str:
+        """Returns the cached clip of a phrase, rendering it with `engine` first if needed."""
+        audio_path = self.get(engine, text)
+        if audio_path:
+            return audio_path
+
+        key = self.key(engine, text)
+        filename = f"{key}.{engine.extension}"
+        audio_path = os.path.join(self.folder, filename)
+        tmp_path = os.path.join(self.folder, f"{key}.tmp.{engine.extension}")
+        engine.render(text, tmp_path)
+        os.replace(tmp_path, audio_path)
+        with self._lock:
+            self.entries[key] = {"file": filename, "engine": engine.name, "text": text,
+                                 "size": os.path.getsize(audio_path), "last_used": time.time()}
+            self._evict(keep=key)
         return audio_path
 
-    def _estimate_speech_duration(self, text: str) -> float:
-        """Estimate duration of spoken text."""
-        words = len(text.split())
-        chars = len(text)
-        return (words * 0.3) + (chars * 0.02)
+    def _evict(self, keep: str) -> None:
+        total = sum(entry["size"] for entry in self.entries.values())
+        for key, entry in sorted(self.entries.items(), key=lambda item: item[1]["last_used"]):
+            if total <= self.max_bytes:
+                break
+            if key == keep:
+                continue
+            try:
+                os.remove(os.path.join(self.folder, entry["file"]))
+            except OSError:
+                pass
+            total -= entry["size"]
+            del self.entries[key]
 
-    def speak(self, text: str) -> float:
-        """Synchronously speak text, using cached audio if available."""
-        audio_path = self._generate_audio(text)
-        pygame.mixer.music.load(audio_path)
-        pygame.mixer.music.play()
-        while pygame.mixer.music.get_busy():
-            time.sleep(0.1)
-        return self._estimate_speech_duration(text)
+    def save(self) -> None:
+        """Writes the manifest."""
+        with self._lock:
+            data = json.dumps(self.entries, indent=1)
+        tmp_file = f"{self.manifest_file}.tmp"
+        with open(tmp_file, "w", encoding="utf-8") as f:
+            f.write(data)
+        os.replace(tmp_file, self.manifest_file)
 
-    def speak_async(self, text: str) -> float:
-        """Asynchronously speak text, using cached audio."""
-        thread = threading.Thread(target=self.speak, args=(text,))
-        thread.start()
-        return self._estimate_speech_duration(text)
 
+class SoundCache:
+    """Thread-safe LRU cache of decoded clips, so each audio file is read and decoded once."""
 
-class CountdownTimer(threading.Thread):
-    """Threaded countdown timer that speaks countdown numbers asynchronously."""
+    def __init__(self, max_items: int = 64) -> None:
+        self.max_items = max_items
+        self._sounds: "OrderedDict[str, pygame.mixer.Sound]" = OrderedDict()
+        self._lock = threading.Lock()
 
-    def __init__(self, duration: int, tts: GTTSpeech) -> None:
-        super().__init__()
-        self.duration = int(duration)
-        self.tts = tts
+    def get(self, audio_path: str) -> pygame.mixer.Sound:
+        with self._lock:
+            sound = self._sounds.get(audio_path)
+            if sound is not None:
+                self._sounds.move_to_end(audio_path)
+                return sound
+        sound = pygame.mixer.Sound(audio_path)  # Decode outside the lock
+        with self._lock:
+            sound = self._sounds.setdefault(audio_path, sound)
+            self._sounds.move_to_end(audio_path)
+            while len(self._sounds) > self.max_items:
+                self._sounds.popitem(last=False)
+        return sound
+
+
+@dataclass
+class PlaybackRequest:
+    """One utterance handed to the AudioScheduler."""
+    audio_path: str
+    kind: str
+    requested_at: float = field(default_factory=time.monotonic)
+    started_at: Optional[float] = None
+    done: threading.Event = field(default_factory=threading.Event)
+
+    @property
+    def latency(self) -> Optional[float]:
+        """Seconds from the request to the start of playback; None if it never played."""
+        return None if self.started_at is None else self.started_at - self.requested_at
+
+
+class AudioScheduler(threading.Thread):
+    """
+    Single thread that owns the mixer channels and plays requests from a queue.
+
+    Each utterance kind has a dedicated channel and a rule from CHANNEL_RULES. The start
+    latency of every request is recorded per kind, see latency_stats().
+    """
+
+    def __init__(self, sounds: SoundCache, poll_interval: float = 0.005) -> None:
+        super().__init__(name="audio-scheduler", daemon=True)
+        self.sounds = sounds
+        self.poll_interval = poll_interval
+        self.requests: "queue.Queue[PlaybackRequest]" = queue.Queue()
+        pygame.mixer.set_reserved(len(CHANNEL_RULES))
+        self.channels = {kind: pygame.mixer.Channel(index) for kind, (index, _) in CHANNEL_RULES.items()}
+        self.waiting: Dict[str, deque] = {kind: deque() for kind in CHANNEL_RULES}
+        self.playing: Dict[str, Optional[PlaybackRequest]] = {kind: None for kind in CHANNEL_RULES}
+        self.latencies: Dict[str, list] = {kind: [] for kind in CHANNEL_RULES}
         self._stop_event = threading.Event()
 
+    def submit(self, audio_path: str, kind: str = "instruction") -> PlaybackRequest:
+        """Queues an audio file for playback; wait on the returned request's `done` event to block."""
+        if kind not in CHANNEL_RULES:
+            raise ValueError(f"Unknown utterance kind: {kind}")
+        request = PlaybackRequest(audio_path, kind)
+        self.requests.put(request)
+        return request
+
     def run(self) -> None:
-        for i in range(self.duration, 0, -1):
-            if self._stop_event.is_set():
-                break
-            self.tts.speak_async(str(i))
-            time.sleep(1)
+        while not self._stop_event.is_set():
+            try:
+                self._accept(self.requests.get(timeout=self.poll_interval))
+                while True:  # Drain everything that arrived meanwhile before touching the channels
+                    self._accept(self.requests.get_nowait())
+            except queue.Empty:
+                pass
+            self._advance()
+        for kind in CHANNEL_RULES:
+            self.channels[kind].stop()
+            self._finish(kind)
+            self._drop_waiting(kind)
+
+    def _accept(self, request: PlaybackRequest) -> None:
+        _, rule = CHANNEL_RULES[request.kind]
+        if rule == "preempt":
+            self._drop_waiting(request.kind)
+            self.channels[request.kind].stop()
+            self._finish(request.kind)
+        self.waiting[request.kind].append(request)
+
+    def _advance(self) -> None:
+        """Marks finished utterances as done and starts the next waiting one on each free channel."""
+        for kind, channel in self.channels.items():
+            if self.playing[kind] is not None and not channel.get_busy():
+                self._finish(kind)
+            if self.playing[kind] is None and self.waiting[kind]:
+                request = self.waiting[kind].popleft()
+                try:
+                    channel.play(self.sounds.get(request.audio_path))
+                except pygame.error as e:
+                    print(f"Error playing {request.audio_path}: {e}")
+                    request.done.set()
+                    continue
+                request.started_at = time.monotonic()
+                self.latencies[kind].append(request.latency)
+                self.playing[kind] = request
+
+    def _finish(self, kind: str) -> None:
+        if self.playing[kind] is not None:
+            self.playing[kind].done.set()
+            self.playing[kind] = None
+
+    def _drop_waiting(self, kind: str) -> None:
+        while self.waiting[kind]:
+            self.waiting[kind].popleft().done.set()
+
+    def latency_stats(self, kind: str) -> Dict[str, float]:
+        """Count, mean, 95th percentile and max start latency (ms) of one utterance kind."""
+        samples = sorted(latency * 1000 for latency in self.latencies[kind])
+        if not samples:
+            return {"count": 0, "mean_ms": 0.0, "p95_ms": 0.0, "max_ms": 0.0}
+        return {
+            "count": len(samples),
+            "mean_ms": sum(samples) / len(samples),
+            "p95_ms": samples[min(len(samples) - 1, int(len(samples) * 0.95))],
+            "max_ms": samples[-1],
+        }
 
     def stop(self) -> None:
         self._stop_event.set()
+        self.join()
+
+
+class PygameSpeech(TextToSpeech):
+    """
+    TextToSpeech that renders phrases with a SpeechEngine and plays them with pygame.
+    - Rendered clips are kept in a PhraseCache on disk, so repeated phrases work offline.
+    - Decoded clips are kept in memory and played by a single AudioScheduler thread.
+    - Phrases the primary engine cannot render (e.g. without network) use the fallback engine.
+    - With playback=False (offline rendering) the mixer only decodes clips: it runs on SDL's
+      dummy audio driver, so no output device is needed, and no AudioScheduler is started.
+    """
+
+    def __init__(self, engine: SpeechEngine, fallback: Optional[SpeechEngine] = None, cache_size: int = 64,
+                 phrase_cache: Optional[PhraseCache] = None, playback: bool = True) -> None:
+        os.makedirs(OUTPUT_FOLDER, exist_ok=True)  # Ensure directory exists
+        self._init_mixer(playback)
+        self.engine = engine
+        self.fallback = fallback
+        self.phrases = phrase_cache or PhraseCache()
+        self.sounds = SoundCache(cache_size)
+        self.scheduler = None
+        if playback:
+            self.scheduler = AudioScheduler(self.sounds)
+            self.scheduler.start()
+        self._engine_failed = False
+
+    @staticmethod
+    def _init_mixer(playback: bool) -> None:
+        """Opens the mixer; without playback on the dummy driver, restoring SDL_AUDIODRIVER afterwards."""
+        previous_driver = os.environ.get("SDL_AUDIODRIVER")
+        if not playback:
+            os.environ["SDL_AUDIODRIVER"] = "dummy"
+        try:
+            pygame.mixer.init(frequency=24000, buffer=512)  # gTTS MP3s are 24 kHz; a small buffer keeps latency low
+        finally:
+            if not playback:
+                if previous_driver is None:
+                    del os.environ["SDL_AUDIODRIVER"]
+                else:
+                    os.environ["SDL_AUDIODRIVER"] = previous_driver
+
+    def _generate_audio(self, text: str) -> str:
+        """Returns the audio file of a phrase, rendering it if it is not cached yet."""
+        if not self._engine_failed or not self.fallback:
+            try:
+                return self.phrases.render(self.engine, text)
+            except Exception as e:
+                if not self.fallback:
+                    raise
+                print(f"{self.engine.name} failed ({e}), using {self.fallback.name} from now on.")
+                self._engine_failed = True  # Don't wait for e.g. a network timeout on every phrase
+        return self.phrases.get(self.engine, text) or self.phrases.render(self.fallback, text)
+
+    def preload(self, text: str) -> str:
+        """Generates and decodes the clip of a phrase ahead of time; returns its path."""
+        audio_path = self._generate_audio(text)
+        self.sounds.get(audio_path)
+        return audio_path
+
+    def prefetch(self, texts: Iterable[str], workers: int = 8) -> None:
+        """Renders and decodes all phrases in parallel, so nothing is synthesized mid-session."""
+        texts = list(dict.fromkeys(texts))
+        failed = 0
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(self.preload, text) for text in texts]
+            for text, future in zip(texts, futures):
+                try:
+                    future.result()
+                except Exception as e:
+                    failed += 1
+                    print(f"Error preparing '{text}': {e}")
+        self.phrases.save()
+        print(f"Prepared {len(texts) - failed}/{len(texts)} phrases.")
+
+    def clip_duration(self, text: str) -> float:
+        """Length in seconds of the decoded clip of a phrase."""
+        return self.sounds.get(self.preload(text)).get_length()
+
+    def clip_key(self, text: str) -> str:
+        """PhraseCache key of the clip in use, which differs when the fallback engine rendered it."""
+        return os.path.splitext(os.path.basename(self.preload(text)))[0]
+
+    def clip_samples(self, text: str) -> Tuple["numpy.ndarray", int]:
+        samples = pygame.sndarray.array(self.sounds.get(self.preload(text)))
+        if samples.ndim == 1:  # Mono mixer
+            samples = samples.reshape(-1, 1)
+        return samples, pygame.mixer.get_init()[0]
+
+    def play(self, text: str, kind: str = "instruction") -> PlaybackRequest:
+        if self.scheduler is None:
+            raise RuntimeError("Speech was created with playback=False and can only render.")
+        return self.scheduler.submit(self.preload(text), kind)
+
+    def speak(self, text: str, kind: str = "instruction") -> float:
+        """Synchronously speak text, using cached audio if available; returns the clip length."""
+        self.play(text, kind).done.wait()
+        return self.clip_duration(text)
+
+    def speak_async(self, text: str, kind: str = "instruction") -> float:
+        """Asynchronously speak text, using cached audio; returns the clip length."""
+        self.play(text, kind)
+        return self.clip_duration(text)
+
+    def latency_report(self) -> str:
+        """One line per utterance kind with the playback start latency."""
+        if self.scheduler is None:
+            return "No clips played."
+        lines = []
+        for kind in CHANNEL_RULES:
+            stats = self.scheduler.latency_stats(kind)
+            lines.append(f"{kind}: {stats['count']} clips, start latency mean {stats['mean_ms']:.1f} ms, "
+                         f"p95 {stats['p95_ms']:.1f} ms, max {stats['max_ms']:.1f} ms")
+        return "\n".join(lines)
+
+    def close(self) -> None:
+        """Stops the audio thread and the mixer."""
+        if self.scheduler is not None:
+            self.scheduler.stop()
+        self.phrases.save()
+        pygame.mixer.quit()
+
+
+class GTTSpeech(PygameSpeech):
+    """PygameSpeech using gTTS, falling back to a local engine when gTTS is unavailable."""
+
+    def __init__(self, cache_size: int = 64, lang: str = "en", offline_fallback: bool = True,
+                 playback: bool = True) -> None:
+        fallback = None
+        if offline_fallback:
+            try:
+                fallback = local_engine()
+            except RuntimeError:
+                pass
+        super().__init__(GTTSEngine(lang), fallback, cache_size, playback=playback)
+
+
+class OfflineSpeech(PygameSpeech):
+    """PygameSpeech using only a local engine (espeak or pyttsx3), for sessions without network."""
+
+    def __init__(self, cache_size: int = 64, engine: Optional[SpeechEngine] = None, playback: bool = True) -> None:
+        super().__init__(engine or local_engine(), cache_size=cache_size, playback=playback)
+
+
+@dataclass
+class TimelineEvent:
+    """One utterance of a planned session."""
+    offset: float  # Planned start, seconds after the session start
+    text: str
+    kind: str = "instruction"
+    fired_at: Optional[float] = None  # Offset at which it was handed to the audio thread
+    request: Optional[PlaybackRequest] = None
+
+
+def mix_timeline(events: List[TimelineEvent], clips: Dict[str, "numpy.ndarray"], sample_rate: int) -> "numpy.ndarray":
+    """
+    Mixes the clips of a timeline into one 16-bit buffer (frames x channels).
+
+    Clips start on the sample of their planned offset and follow CHANNEL_RULES like live
+    playback: a queued clip waits for the previous one of its kind, a preempting clip cuts it off.
+    """
+    import numpy as np  # Only needed for offline rendering
+
+    placements = []  # [start frame, samples, kind]
+    last = {}  # kind -> its latest placement
+    for event in events:
+        samples = clips[event.text]
+        start = round(event.offset * sample_rate)
+        previous = last.get(event.kind)
+        if previous is not None:
+            previous_end = previous[0] + len(previous[1])
+            if CHANNEL_RULES[event.kind][1] == "queue":
+                start = max(start, previous_end)
+            elif previous_end > start:
+                previous[1] = previous[1][:max(0, start - previous[0])]
+        last[event.kind] = [start, samples, event.kind]
+        placements.append(last[event.kind])
+
+    frames = max((start + len(samples) for start, samples, _ in placements), default=0)
+    channels = max((samples.shape[1] for _, samples, _ in placements), default=1)
+    mix = np.zeros((frames, channels), dtype=np.int32)
+    for start, samples, _ in placements:
+        mix[start:start + len(samples)] += samples
+    return np.clip(mix, -32768, 32767).astype(np.int16)
+
+
+def write_audio(path: str, samples: "numpy.ndarray", sample_rate: int) -> None:
+    """Writes 16-bit samples to a WAV file, or to OGG/FLAC through the optional soundfile package."""
+    tmp_path = f"{path}.tmp"
+    extension = os.path.splitext(path)[1].lower()
+    if extension == ".wav":
+        with wave.open(tmp_path, "wb") as wav_file:
+            wav_file.setnchannels(samples.shape[1])
+            wav_file.setsampwidth(2)
+            wav_file.setframerate(sample_rate)
+            wav_file.writeframes(samples.astype("<i2").tobytes())
+    else:
+        import soundfile  # Optional, for compressed formats
+
+        soundfile.write(tmp_path, samples, sample_rate, format=extension[1:].upper())
+    os.replace(tmp_path, path)
+
+
+def default_audio_format() -> str:
+    """"ogg" when soundfile is installed, else "wav"."""
+    try:
+        import soundfile  # noqa: F401
+    except ImportError:
+        return "wav"
+    return "ogg"
 
 
 class BreathingExercise:
@@ -98,32 +590,155 @@ class BreathingExercise:
     def __init__(self, tts: TextToSpeech) -> None:
         self.tts = tts
 
-    def breath_phase(self, instruction: str, duration: int) -> None:
+    @staticmethod
+    def cycle_instructions(inhale: int, hold: int, exhale: int) -> List[Tuple[str, int]]:
+        """(instruction, phase duration) of the three phases of one cycle."""
+        return [
+            (f"Inhale slowly for {inhale} seconds, expanding your lungs fully.", inhale),
+            (f"Hold your breath for {hold} seconds to let the oxygen circulate.", hold),
+            (f"Exhale slowly for {exhale} seconds, releasing all tension.", exhale),
+        ]
+
+    @staticmethod
+    def completion_message(cycles_completed: int) -> str:
+        return (f"Exercise completed! You completed {cycles_completed} cycles. "
+                f"Enjoy the calm and relaxation that follows.")
+
+    def session_phrases(self, inhale: int, hold: int, exhale: int) -> List[str]:
+        """Phrases whose durations shape the timeline: the introduction and the phase instructions."""
+        phrases = [WELCOME_MESSAGE, TECHNIQUE_MESSAGE]
+        phrases += [instruction for instruction, _ in self.cycle_instructions(inhale, hold, exhale)]
+        return phrases
+
+    def plan_session(self, total_duration: int, inhale: int, hold: int, exhale: int) -> List[TimelineEvent]:
+        """
+        Prepares every phrase of a session and returns its timeline.
+
+        The introduction and instructions are prepared first, since their lengths decide the
+        timeline; then whatever else the timeline speaks (countdown numbers, the completion
+        message with the real cycle count), so nothing is synthesized mid-session.
+        """
+        self.tts.prefetch(self.session_phrases(inhale, hold, exhale))
+        events = self.build_timeline(total_duration, inhale, hold, exhale)
+        self.tts.prefetch(event.text for event in events)
+        return events
+
+    def build_timeline(self, total_duration: int, inhale: int, hold: int, exhale: int) -> List[TimelineEvent]:
+        """
+        Lays out the whole session from the real clip durations.
+
+        Each phase lasts its duration, or as long as its instruction if that is longer.
+        Countdown numbers fill the rest of the phase so that "1" is spoken one second
+        before the next phase starts. Only whole cycles that fit into `total_duration`
+        (measured from the end of the introduction, at least one) are scheduled.
+        """
+        events = [TimelineEvent(0.0, WELCOME_MESSAGE)]
+        offset = self.tts.clip_duration(WELCOME_MESSAGE) + INTRO_PAUSE
+        events.append(TimelineEvent(offset, TECHNIQUE_MESSAGE))
+        offset += self.tts.clip_duration(TECHNIQUE_MESSAGE) + INTRO_PAUSE
+
+        phases = []
+        for instruction, duration in self.cycle_instructions(inhale, hold, exhale):
+            speech_duration = self.tts.clip_duration(instruction)
+            phases.append((instruction, max(duration, speech_duration), int(duration - speech_duration)))
+        cycle_duration = sum(phase_duration for _, phase_duration, _ in phases)
+        cycles = max(1, int(total_duration // cycle_duration))
+
+        for _ in range(cycles):
+            for instruction, phase_duration, count in phases:
+                events.append(TimelineEvent(offset, instruction))
+                events += [TimelineEvent(offset + phase_duration - i, str(i), "countdown") for i in range(count, 0, -1)]
+                offset += phase_duration
+        events.append(TimelineEvent(offset, self.completion_message(cycles)))
+        return events
+
+    def run_timeline(self, events: List[TimelineEvent]) -> float:
         """
-        Speaks the instruction and concurrently starts a countdown for the adjusted duration.
+        Fires the events at their planned offsets; returns the monotonic start time of the session.
+
+        Deadlines are absolute, so a late event does not delay the ones after it. Each wait
+        sleeps until shortly before the deadline and spins for the rest, which keeps the
+        scheduler jitter of time.sleep out of the timing.
         """
-        speech_duration = self.tts.speak(instruction)
-        adjusted_sleep_time = max(0, duration - speech_duration)
+        start = time.monotonic()
+        for event in events:
+            deadline = start + event.offset
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                time.sleep(remaining - SPIN_INTERVAL if remaining > SPIN_INTERVAL else 0)
+            event.fired_at = time.monotonic() - start
+            event.request = self.tts.play(event.text, event.kind)
+        if events and events[-1].request:
+            events[-1].request.done.wait()
+        return start
 
-        countdown = CountdownTimer(adjusted_sleep_time, self.tts)
-        countdown.start()
-        time.sleep(adjusted_sleep_time)
-        countdown.stop()
-        countdown.join()
+    @staticmethod
+    def timing_report(events: List[TimelineEvent], start: float, log_file: str = TIMING_LOG_FILE) -> str:
+        """Writes the planned and actual offset of every event to a CSV file and summarizes the errors."""
+        os.makedirs(os.path.dirname(log_file) or ".", exist_ok=True)
+        errors = []
+        with open(log_file, "w", encoding="utf-8", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(["kind", "text", "planned_s", "fired_s", "started_s", "error_ms"])
+            for event in events:
+                started = event.request.started_at if event.request else None
+                if started is None:  # Never played, e.g. preempted by the next countdown number
+                    writer.writerow([event.kind, event.text, f"{event.offset:.4f}", f"{event.fired_at:.4f}", "", ""])
+                    continue
+                error_ms = (started - start - event.offset) * 1000
+                errors.append(abs(error_ms))
+                writer.writerow([event.kind, event.text, f"{event.offset:.4f}", f"{event.fired_at:.4f}",
+                                 f"{started - start:.4f}", f"{error_ms:.2f}"])
+        if not errors:
+            return f"Timing: no events played, log: {log_file}"
+        return (f"Timing: {len(errors)}/{len(events)} events played, start error mean "
+                f"{sum(errors) / len(errors):.1f} ms, max {max(errors):.1f} ms, log: {log_file}")
 
-    def breath_cycle(self, inhale: int, hold: int, exhale: int) -> None:
+    def session_file(self, events: List[TimelineEvent], total_duration: int, inhale: int, hold: int, exhale: int,
+                     audio_format: str) -> str:
         """
-        Executes one complete breathing cycle.
+        Path of the rendered session.
+
+        The name carries a hash of the timeline (text, offset and kind of every event) and of
+        the clip used for every phrase, so changed phrases, engine settings or a fallback
+        engine lead to a new file instead of a stale one.
         """
-        self.breath_phase(
-            f"Inhale slowly for {inhale} seconds, expanding your lungs fully.", inhale
-        )
-        self.breath_phase(
-            f"Hold your breath for {hold} seconds to let the oxygen circulate.", hold
-        )
-        self.breath_phase(
-            f"Exhale slowly for {exhale} seconds, releasing all tension.", exhale
-        )
+        digest = hashlib.sha256()
+        for event in events:
+            digest.update(f"{event.kind}|{event.offset:.4f}|{event.text}\n".encode("utf-8"))
+        for text in sorted({event.text for event in events}):
+            digest.update(f"{text}|{self.tts.clip_key(text)}\n".encode("utf-8"))
+        return os.path.join(SESSION_FOLDER, f"session_{total_duration}s_{inhale}-{hold}-{exhale}_"
+                                            f"{digest.hexdigest()[:16]}.{audio_format}")
+
+    def render_session(
+        self, total_duration: int = 300, inhale: int = 4, hold: int = 7, exhale: int = 8,
+        audio_format: Optional[str] = None
+    ) -> str:
+        """
+        Renders the whole session into one audio file and returns its path.
+
+        The session is planned like a live one (plan_session) and its clips are mixed
+        sample-accurately into a single buffer. The file is cached by its timeline and
+        clips (see session_file), so rendering the same session again only costs the
+        planning, which reads the cached phrases.
+        """
+        audio_format = audio_format or default_audio_format()
+        events = self.plan_session(total_duration, inhale, hold, exhale)
+        session_file = self.session_file(events, total_duration, inhale, hold, exhale, audio_format)
+        if os.path.exists(session_file):
+            return session_file
+
+        clips = {}
+        sample_rate = None
+        for text in dict.fromkeys(event.text for event in events):
+            clips[text], sample_rate = self.tts.clip_samples(text)
+        os.makedirs(SESSION_FOLDER, exist_ok=True)
+        write_audio(session_file, mix_timeline(events, clips, sample_rate), sample_rate)
+        print(f"Session rendered: {session_file}")
+        return session_file
 
     def start_exercise(
         self, total_duration: int = 300, inhale: int = 4, hold: int = 7, exhale: int = 8
@@ -131,30 +746,64 @@ class BreathingExercise:
         """
         Start the guided breathing exercise for the specified total duration.
         Default total_duration is 300 seconds (5 minutes). Adjust as needed.
+        All phrases are prepared and the whole session is planned before it starts.
         """
-        self.tts.speak(
-            "Welcome to your guided breathing exercise. Sit comfortably with your back straight and relax your shoulders."
-        )
-        time.sleep(2)
-        self.tts.speak(
-            "We will use the 4-7-8 breathing technique, known to reduce stress and promote relaxation."
-        )
-        time.sleep(2)
+        events = self.plan_session(total_duration, inhale, hold, exhale)
+        start = self.run_timeline(events)
+        print(self.timing_report(events, start))
 
-        start_time = time.time()
-        cycles_completed = 0
 
-        while time.time() - start_time < total_duration:
-            self.breath_cycle(inhale, hold, exhale)
-            cycles_completed += 1
-
-        self.tts.speak(
-            f"Exercise completed! You completed {cycles_completed} cycles. Enjoy the calm and relaxation that follows."
-        )
+def play_audio_file(audio_file: str) -> None:
+    """Plays a rendered session file, streamed by the mixer, until it ends."""
+    pygame.mixer.init()
+    try:
+        pygame.mixer.music.load(audio_file)
+        pygame.mixer.music.play()
+        while pygame.mixer.music.get_busy():
+            time.sleep(0.2)
+    finally:
+        pygame.mixer.quit()
 
 
-if __name__ == '__main__':
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Guided 4-7-8 breathing exercise.")
     # Default total exercise duration is 5 minutes (300 seconds)
-    tts_engine = GTTSpeech()
+    parser.add_argument("--duration", type=int, default=300, help="Total exercise duration in seconds.")
+    parser.add_argument("--inhale", type=int, default=4, help="Inhale seconds.")
+    parser.add_argument("--hold", type=int, default=7, help="Hold seconds.")
+    parser.add_argument("--exhale", type=int, default=8, help="Exhale seconds.")
+    parser.add_argument("--offline", action="store_true", help="Use a local speech engine (espeak or pyttsx3).")
+    # "auto" is the value of a bare --render and must be a valid choice itself.
+    parser.add_argument("--render", choices=["auto", "wav", "ogg"], nargs="?", const="auto",
+                        help="Render the session to an audio file (cached) instead of playing it live; "
+                             "auto picks ogg when soundfile is installed, else wav.")
+    parser.add_argument("--play", action="store_true", help="With --render, play the rendered file.")
+    return parser
+
+
+def main(argv=None) -> None:
+    args = build_parser().parse_args(argv)
+    session = (args.duration, args.inhale, args.hold, args.exhale)
+
+    playback = not args.render  # Rendering only decodes clips and needs no audio device
+    tts_engine = OfflineSpeech(playback=playback) if args.offline else GTTSpeech(playback=playback)
     breathing_session = BreathingExercise(tts_engine)
-    breathing_session.start_exercise(total_duration=300)
+    if args.render:
+        try:
+            audio_file = breathing_session.render_session(
+                *session, audio_format=None if args.render == "auto" else args.render)
+        finally:
+            tts_engine.close()
+        print(audio_file)
+        if args.play:
+            play_audio_file(audio_file)
+        return
+
+    try:
+        breathing_session.start_exercise(*session)
+    finally:
+        print(tts_engine.latency_report())
+        tts_engine.close()
+
+if __name__ == '__main__':
+    main()
@@ -34,7 +34,11 @@ def create_requirements_txt(save_path: str, python_interpreter: str) -> None:
         print(f"An unexpected error occurred: {error}")
 
 
-if __name__ == "__main__":
+def main() -> None:
     SAVE_PATH = "requirements.txt"
     PYTHON_INTERPRETER = r"C:\Users\libin\01_Project\Automation_Projects\.venv\Scripts\python.exe"  # Change this path to interpreter path
     create_requirements_txt(SAVE_PATH, PYTHON_INTERPRETER)
+
+
+if __name__ == "__main__":
+    main()
@@ -5,12 +5,26 @@ Author: Libin Andrews
 This tool calculates future times based on a given start time and a list of time additions.
 It also determines the elapsed time since a specified log time.
 Formatted output is provided using the Rich library for better readability.
+
+Batch mode (`--batch clock_ins.csv`) does the same for a whole CSV or JSONL file of
+clock-in events (`person`, `clock_in` as "YYYY-MM-DD HH:MM", or "HH:MM" for the latest such time),
+vectorized with NumPy in chunks, and prints a table or writes a CSV/JSONL file (`--output`).
 """
 
+import os
+import csv
+import json
+import argparse
 from datetime import datetime, timedelta
 from rich.console import Console
 from rich.align import Align
-from typing import List, Tuple
+from rich.table import Table
+from typing import Iterator, List, Optional, Tuple
+
+# Offsets (hours, minutes) from the log-in time; the important one is highlighted.
+TIMES_TO_ADD = [(7, 10), (8, 0), (9, 0), (9, 36), (10, 0)]
+IMPORTANT_OFFSET = (9, 36)
+BATCH_CHUNK_SIZE = 500_000  # Rows per vectorized pass in batch mode
 
 class TimeCalculator:
     """Handles time calculations including addition and elapsed time."""
@@ -18,7 +32,7 @@ class TimeCalculator:
     @staticmethod
     def add_time(hours: int, minutes: int, add_hours: int = 0, add_minutes: int = 0) -> str:
         """Adds hours and minutes to a given time."""
-        initial_time = datetime.strptime(f"{hours}:{minutes}", "%H:%M")
+        initial_time = datetime(1900, 1, 1, hours, minutes)
         new_time = initial_time + timedelta(hours=add_hours, minutes=add_minutes)
         return new_time.strftime("%I:%M %p")
 
@@ -36,6 +50,152 @@ class TimeCalculator:
         elapsed_minutes, _ = divmod(remainder, 60)
         return int(elapsed_hours), int(elapsed_minutes)
 
+    @staticmethod
+    def parse_clock_ins(values: List[str], now: Optional[datetime] = None) -> "numpy.ndarray":
+        """
+        Parses clock-in strings into a datetime64[m] array in one pass.
+
+        Values are "YYYY-MM-DD HH:MM" (or ISO "YYYY-MM-DDTHH:MM"), or "HH:MM" for the latest
+        log-in at that time: today, or yesterday if the time is later than `now`, as in
+        time_elapsed_since.
+        """
+        import numpy as np  # Only needed in batch mode
+
+        values = np.char.strip(np.asarray(values, dtype=str))
+        clock_ins = np.empty(len(values), dtype="datetime64[m]")
+        time_only = np.char.find(values, "-") < 0
+        if time_only.any():
+            parts = np.char.partition(values[time_only], ":")
+            minutes = parts[:, 0].astype(np.int64) * 60 + parts[:, 2].astype(np.int64)
+            now = now or datetime.now()
+            day = np.datetime64(now.date(), "m")
+            day = np.where(minutes > now.hour * 60 + now.minute, day - np.timedelta64(1, "D"), day)
+            clock_ins[time_only] = day + minutes.astype("timedelta64[m]")
+        if not time_only.all():
+            clock_ins[~time_only] = values[~time_only].astype("datetime64[m]")
+        return clock_ins
+
+    @staticmethod
+    def add_times_batch(clock_ins: "numpy.ndarray", times_to_add: List[Tuple[int, int]]) -> "numpy.ndarray":
+        """Leave times for every clock-in (rows) and offset (columns), as datetime64[m]."""
+        import numpy as np
+
+        offsets = np.array([hours * 60 + minutes for hours, minutes in times_to_add], dtype="timedelta64[m]")
+        return clock_ins[:, None] + offsets[None, :]
+
+    @staticmethod
+    def time_elapsed_since_batch(clock_ins: "numpy.ndarray",
+                                 now: Optional[datetime] = None) -> Tuple["numpy.ndarray", "numpy.ndarray"]:
+        """
+        Hours and minutes elapsed since every clock-in, counted from its full date and time.
+
+        Time-only clock-ins are already dated to their latest past occurrence by
+        parse_clock_ins, so they wrap around midnight like time_elapsed_since. Clock-ins
+        after `now` give negative hours and minutes.
+        """
+        import numpy as np
+
+        now = np.datetime64((now or datetime.now()).replace(second=0, microsecond=0), "m")
+        elapsed = (now - clock_ins).astype(np.int64)  # Minutes
+        hours, minutes = np.divmod(np.abs(elapsed), 60)
+        sign = np.sign(elapsed)
+        return sign * hours, sign * minutes
+
+def _iter_jsonl_rows(input_file: str, lines: Iterator[str]) -> Iterator[Tuple[str, str]]:
+    """Yields (person, clock-in) of every JSONL record, with the line number in any error."""
+    for line_number, line in enumerate(lines, 1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as e:
+            raise ValueError(f"{input_file}:{line_number}: invalid JSON ({e})")
+        if not isinstance(record, dict) or "clock_in" not in record:
+            raise ValueError(f"{input_file}:{line_number}: record has no 'clock_in' key")
+        yield record.get("person", ""), record["clock_in"]
+
+
+def iter_clock_in_chunks(input_file: str, chunk_size: int = BATCH_CHUNK_SIZE) -> Iterator[Tuple[List[str], List[str]]]:
+    """Reads (persons, clock-ins) from a CSV or JSONL file in chunks of `chunk_size` rows."""
+    persons, clock_ins = [], []
+    with open(input_file, "r", encoding="utf-8", newline="") as f:
+        if input_file.lower().endswith((".jsonl", ".ndjson")):
+            rows = _iter_jsonl_rows(input_file, f)
+        else:
+            reader = csv.reader(f)
+            header = next(reader, [])
+            if "clock_in" not in header:
+                raise ValueError(f"{input_file}: missing 'clock_in' column (found: {', '.join(header) or 'nothing'})")
+            clock_in_column = header.index("clock_in")
+            person_column = header.index("person") if "person" in header else None
+            rows = ((row[person_column] if person_column is not None else "", row[clock_in_column])
+                    for row in reader if row)
+        for person, clock_in in rows:
+            persons.append(person)
+            clock_ins.append(clock_in)
+            if len(clock_ins) >= chunk_size:
+                yield persons, clock_ins
+                persons, clock_ins = [], []
+    if clock_ins:
+        yield persons, clock_ins
+
+
+def format_times(times: "numpy.ndarray") -> list:
+    """
+    Formats a datetime64[m] array as ISO strings ("YYYY-MM-DDTHH:MM").
+
+    Clock-in data repeats the same minutes a lot, so only the distinct values are formatted.
+    """
+    import numpy as np
+
+    values, inverse = np.unique(times, return_inverse=True)
+    return np.datetime_as_string(values, unit="m")[inverse.reshape(times.shape)].tolist()
+
+
+def offset_label(add_hours: int, add_minutes: int) -> str:
+    return f"leave_{add_hours}h{add_minutes:02d}"
+
+
+def calculate_batch(input_file: str, times_to_add: List[Tuple[int, int]], now: Optional[datetime] = None,
+                    chunk_size: int = BATCH_CHUNK_SIZE) -> Iterator[Tuple[list, ...]]:
+    """
+    Yields result columns per chunk: persons, clock-ins, one column of leave times per offset,
+    elapsed hours and elapsed minutes. Times are ISO formatted ("YYYY-MM-DDTHH:MM").
+    """
+    now = now or datetime.now()
+    for persons, values in iter_clock_in_chunks(input_file, chunk_size):
+        clock_ins = TimeCalculator.parse_clock_ins(values, now)
+        leave_times = TimeCalculator.add_times_batch(clock_ins, times_to_add)
+        elapsed_hours, elapsed_minutes = TimeCalculator.time_elapsed_since_batch(clock_ins, now)
+        yield (persons,
+               format_times(clock_ins),
+               *format_times(leave_times.T),
+               elapsed_hours.tolist(), elapsed_minutes.tolist())
+
+
+def write_batch(input_file: str, output_file: str, times_to_add: List[Tuple[int, int]],
+                now: Optional[datetime] = None) -> int:
+    """Writes the batch results to a CSV or JSONL file (by extension); returns the number of rows."""
+    header = ["person", "clock_in", *(offset_label(*offset) for offset in times_to_add),
+              "elapsed_hours", "elapsed_minutes"]
+    rows_written = 0
+    tmp_file = f"{output_file}.tmp"
+    with open(tmp_file, "w", encoding="utf-8", newline="") as f:
+        as_jsonl = output_file.lower().endswith((".jsonl", ".ndjson"))
+        writer = None if as_jsonl else csv.writer(f)
+        if writer:
+            writer.writerow(header)
+        for columns in calculate_batch(input_file, times_to_add, now):
+            rows = zip(*columns)
+            if as_jsonl:
+                f.writelines(json.dumps(dict(zip(header, row))) + "\n" for row in rows)
+            else:
+                writer.writerows(rows)
+            rows_written += len(columns[0])
+    os.replace(tmp_file, output_file)
+    return rows_written
+
+
 class ConsolePrinter:
     """Handles console output formatting using rich."""
     
@@ -46,7 +206,7 @@ class ConsolePrinter:
         """Prints time calculations for added hours and minutes."""
         for add_hours, add_minutes in times_to_add:
             new_time = TimeCalculator.add_time(h, m, add_hours, add_minutes)
-            if add_hours == 9 and add_minutes == 36:
+            if (add_hours, add_minutes) == IMPORTANT_OFFSET:
                 self._print_important(f"{add_hours} hours {add_minutes} min from {h}:{m} is [bold yellow]{new_time}[/bold yellow]")
             else:
                 self._print_normal(f"{add_hours} hours {add_minutes} min from {h}:{m} is [bold yellow]{new_time}[/bold yellow]")
@@ -56,18 +216,59 @@ class ConsolePrinter:
         elapsed_hours, elapsed_minutes = TimeCalculator.time_elapsed_since(h, m)
         self._print_normal(f"Time since log is [bold yellow]{elapsed_hours} hours and {elapsed_minutes} minutes[/bold yellow]")
     
+    def print_batch_table(self, input_file: str, times_to_add: List[Tuple[int, int]]) -> None:
+        """Prints the batch results of a clock-in file as a table."""
+        table = Table(title=f"Leave times for {os.path.basename(input_file)}")
+        table.add_column("Person")
+        table.add_column("Log-in")
+        for add_hours, add_minutes in times_to_add:
+            style = "bold red" if (add_hours, add_minutes) == IMPORTANT_OFFSET else "bold yellow"
+            table.add_column(f"+{add_hours}h {add_minutes:02d}m", style=style)
+        table.add_column("Since log")
+        for columns in calculate_batch(input_file, times_to_add):
+            for person, clock_in, *leave_times, hours, minutes in zip(*columns):
+                table.add_row(person, clock_in, *leave_times, f"{hours}h {minutes:02d}m")
+        self.console.print(Align.center(table))
+
     def _print_normal(self, text: str) -> None:
         self.console.print(Align.center(f"[bold]{text}[/bold]"))
     
     def _print_important(self, text: str) -> None:
         self.console.print(Align.center(f"[bold red]{text}[/bold red]"))
 
-def main() -> None:
+def parse_offsets(text: str) -> List[Tuple[int, int]]:
+    """Parses "7:10,8:00" into [(7, 10), (8, 0)]."""
+    offsets = []
+    for item in text.split(","):
+        hours, _, minutes = item.strip().partition(":")
+        offsets.append((int(hours), int(minutes or 0)))
+    return offsets
+
+
+def main(argv=None) -> None:
     """Main function to execute the time calculations and display results."""
-    h, m = 9, 30
-    times_to_add = [(7, 10), (8, 0), (9, 0), (9, 36), (10, 0)]
-    
+    parser = argparse.ArgumentParser(description="Show leave times and time since log-in.")
+    parser.add_argument("--batch", metavar="CLOCK_INS", help="CSV or JSONL file with person and clock_in columns.")
+    parser.add_argument("--output", help="Write the batch results to this CSV or JSONL file instead of a table.")
+    parser.add_argument("--offsets", type=parse_offsets, default=TIMES_TO_ADD,
+                        help='Offsets to add, e.g. "7:10,8:00,9:36" (default: the standard ones).')
+    args = parser.parse_args(argv)
+
     printer = ConsolePrinter()
+    if args.batch:
+        try:
+            if args.output:
+                rows = write_batch(args.batch, args.output, args.offsets)
+                print(f"Wrote {rows} rows to {args.output}")
+            else:
+                printer.print_batch_table(args.batch, args.offsets)
+        except (OSError, ValueError) as e:
+            parser.exit(1, f"Error: {e}\n")
+        return
+
+    h, m = 9, 30
+    times_to_add = args.offsets
+
     print("-" * 50 + " Start of Tool " + "-" * 50)
     printer.print_time_addition(h, m, times_to_add)
     printer.print_elapsed_time(h, m)
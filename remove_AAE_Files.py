@@ -12,23 +12,191 @@ No encryption is used in this script as it is intended for file deletion only.
 Usage:
 - Run the script and provide the target directory.
 - The script will recursively find and remove all .AAE files.
+- Non-interactive: python remove_AAE_Files.py <directory> [--dry-run] [--workers N] [--full] [--rule RULE]
+- --rule orphaned only removes sidecars whose original image is gone; --rule paired only those whose image exists.
+- Directory mtimes are remembered between runs, so only changed folders are listed again.
+  Use --full to force a complete rescan.
 
 """
 import os
-from typing import List
+import re
+import json
+import queue
+import argparse
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Iterable, Iterator, List, NamedTuple, Optional, Set, Tuple
 from rich.console import Console
-from rich.progress import Progress, BarColumn, TextColumn, TimeRemainingColumn
+from rich.filesize import decimal
+from rich.progress import Progress, BarColumn, SpinnerColumn, TextColumn, TimeElapsedColumn, TimeRemainingColumn
 
 console = Console()
 
+INDEX_FILE = os.path.join("output", "remove_aae", "dir_index.json")
+RULES = ("all", "orphaned", "paired")
+IMAGE_EXTENSIONS = {".heic", ".heif", ".jpg", ".jpeg", ".png", ".gif", ".tif", ".tiff", ".dng", ".mov", ".mp4"}
+_VARIANT_STEM = re.compile(r"^([A-Za-z]+_)[EO](\d+)$")
+
+class DirectoryIndex:
+    """
+    Directory mtimes and inode numbers recorded by the last run, per scan root.
+
+    A directory whose mtime and inode are unchanged has had no entries added,
+    removed or renamed, so its recorded subdirectories are reused without listing
+    it again. Renamed folders are recognised by their inode; folders that were not
+    visited in this run are dropped from the index when it is saved.
+    """
+
+    def __init__(self, root: str, index_file: str = INDEX_FILE, full: bool = False, rule: str = "all") -> None:
+        # Kept sidecars do not change a folder's mtime, so each rule keeps its own index.
+        self.root = f"{os.path.abspath(root)}|{rule}"
+        self.index_file = index_file
+        self.all_roots = {}
+        if os.path.exists(index_file):
+            try:
+                with open(index_file, "r", encoding="utf-8") as f:
+                    self.all_roots = json.load(f)
+            except (OSError, ValueError) as e:
+                console.log(f"[yellow]Ignoring unreadable index {index_file}:[/yellow] {e}")
+        self.previous = {} if full else self.all_roots.get(self.root, {})
+        self._by_inode = {entry["inode"]: path for path, entry in self.previous.items() if entry["inode"]}
+        self.current = {}
+        self.scanned = 0
+        self.skipped = 0
+        self._lock = threading.Lock()
+
+    def unchanged_subdirs(self, path: str, st: os.stat_result) -> Optional[List[str]]:
+        """Returns the recorded subdirectory names if the directory did not change, else None."""
+        entry = self.previous.get(path)
+        if (entry is None or entry["inode"] != st.st_ino) and st.st_ino:
+            entry = self.previous.get(self._by_inode.get(st.st_ino, ""))
+        if entry and entry["mtime_ns"] == st.st_mtime_ns and entry["inode"] == st.st_ino:
+            return entry["subdirs"]
+        return None
+
+    def record(self, path: str, st: os.stat_result, subdirs: List[str], skipped: bool = False) -> None:
+        with self._lock:
+            self.current[path] = {"mtime_ns": st.st_mtime_ns, "inode": st.st_ino, "subdirs": subdirs}
+            if skipped:
+                self.skipped += 1
+            else:
+                self.scanned += 1
+
+    def invalidate(self, path: str) -> None:
+        """Forces a directory to be listed again next run, e.g. after a failed delete."""
+        with self._lock:
+            self.current.pop(path, None)
+
+    def save(self) -> None:
+        self.all_roots[self.root] = self.current
+        os.makedirs(os.path.dirname(self.index_file) or ".", exist_ok=True)
+        tmp_file = f"{self.index_file}.tmp"
+        with open(tmp_file, "w", encoding="utf-8") as f:
+            json.dump(self.all_roots, f)
+        os.replace(tmp_file, self.index_file)
+
+class DirectoryListing(NamedTuple):
+    """Everything the cleanup needs from one directory, read in a single listing."""
+
+    aae_entries: List[os.DirEntry]
+    subdirs: List[str]
+    image_stems: Set[str]
+
+def _normalize_stem(stem: str) -> str:
+    """Maps Apple's edited/original variants (IMG_E1234, IMG_O1234) onto IMG_1234, case-insensitively."""
+    return _VARIANT_STEM.sub(r"\1\2", stem).lower()
+
+def _scan_directory(path: str) -> DirectoryListing:
+    """Lists a directory once and indexes its .AAE entries, subdirectories and image stems."""
+    aae_entries = []
+    subdirs = []
+    image_stems = set()
+    with os.scandir(path) as entries:
+        for entry in entries:
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    subdirs.append(entry.path)
+                    continue
+                stem, ext = os.path.splitext(entry.name)
+                ext = ext.lower()
+                if ext == ".aae":
+                    aae_entries.append(entry)
+                elif ext in IMAGE_EXTENSIONS:
+                    image_stems.add(_normalize_stem(stem))
+            except OSError as e:
+                console.log(f"[red]Error reading {entry.path}:[/red] {e}")
+    return DirectoryListing(aae_entries, subdirs, image_stems)
+
+def select_sidecars(listing: DirectoryListing, rule: str = "all") -> List[os.DirEntry]:
+    """
+    Applies a deletion rule to the .AAE files of one directory listing.
+
+    Rules:
+    - all: every .AAE file.
+    - orphaned: sidecars whose original image (HEIC/JPG/MOV/..., any IMG_E/IMG_O variant) is gone.
+    - paired: sidecars whose original image still exists.
+    """
+    if rule == "all":
+        return listing.aae_entries
+    want_paired = rule == "paired"
+    return [
+        entry for entry in listing.aae_entries
+        if (_normalize_stem(os.path.splitext(entry.name)[0]) in listing.image_stems) == want_paired
+    ]
+
+def _visit_directory(path: str, index: Optional[DirectoryIndex], rule: str) -> Tuple[List[os.DirEntry], List[str]]:
+    """Returns the sidecars to delete in one directory and the subdirectories to visit next."""
+    st = os.stat(path) if index else None
+    subdir_names = index.unchanged_subdirs(path, st) if index else None
+    if subdir_names is not None:
+        index.record(path, st, subdir_names, skipped=True)
+        return [], [os.path.join(path, name) for name in subdir_names]
+    listing = _scan_directory(path)
+    if index:
+        index.record(path, st, [os.path.basename(subdir) for subdir in listing.subdirs])
+    return select_sidecars(listing, rule), listing.subdirs
+
+def iter_aae_files(directory: str, index: Optional[DirectoryIndex] = None, rule: str = "all",
+                   workers: int = 1) -> Iterator[os.DirEntry]:
+    """
+    Lazily yields the .AAE files below the given directory that match `rule`, one directory listing at a time.
+
+    With an index, directories unchanged since the last run are not listed again;
+    only their recorded subdirectories are visited. With more than one worker,
+    directories are listed in parallel and results arrive in completion order.
+    """
+    root = os.path.abspath(directory) if index else directory
+    if workers <= 1:
+        stack = [root]
+        while stack:
+            path = stack.pop()
+            try:
+                selected, subdirs = _visit_directory(path, index, rule)
+            except OSError as e:
+                console.log(f"[red]Error scanning {path}:[/red] {e}")
+                continue
+            yield from selected
+            stack.extend(reversed(subdirs))
+        return
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        pending = {executor.submit(_visit_directory, root, index, rule): root}
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                path = pending.pop(future)
+                try:
+                    selected, subdirs = future.result()
+                except OSError as e:
+                    console.log(f"[red]Error scanning {path}:[/red] {e}")
+                    continue
+                yield from selected
+                for subdir in subdirs:
+                    pending[executor.submit(_visit_directory, subdir, index, rule)] = subdir
+
 def find_aae_files(directory: str) -> List[str]:
     """Recursively finds all .AAE files in the given directory."""
-    aae_files = []
-    for root, _, files in os.walk(directory):
-        for file in files:
-            if file.lower().endswith(".aae"):
-                aae_files.append(os.path.join(root, file))
-    return aae_files
+    return [entry.path for entry in iter_aae_files(directory)]
 
 def delete_files(files: List[str]):
     """Deletes the given list of files with a progress bar."""
@@ -49,21 +217,125 @@ def delete_files(files: List[str]):
             finally:
                 progress.update(task, advance=1)
 
-def main():
+class CleanupStats:
+    """Thread-safe counters shared by the scanner and the delete workers."""
+
+    def __init__(self) -> None:
+        self.discovered = 0
+        self.deleted = 0
+        self.failed = 0
+        self.bytes_freed = 0
+        self.failed_paths: List[str] = []
+        self._lock = threading.Lock()
+
+    def add(self, deleted: int = 0, bytes_freed: int = 0, failed_path: Optional[str] = None) -> None:
+        with self._lock:
+            self.deleted += deleted
+            self.bytes_freed += bytes_freed
+            if failed_path:
+                self.failed += 1
+                self.failed_paths.append(failed_path)
+
+def delete_files_streaming(entries: Iterable[os.DirEntry], workers: int = 4, dry_run: bool = False,
+                           queue_size: int = 1024) -> CleanupStats:
+    """
+    Deletes files as they are discovered.
+
+    The scan feeds a bounded queue consumed by a pool of unlink workers, so
+    deletion starts with the first match and memory stays flat. In dry-run mode
+    nothing is removed and the bytes that would be freed are counted instead.
+    """
+    stats = CleanupStats()
+    work_queue: "queue.Queue[Optional[os.DirEntry]]" = queue.Queue(maxsize=queue_size)
+    action = "Would delete" if dry_run else "Deleted"
+
+    with Progress(
+        SpinnerColumn(),
+        TextColumn("[cyan]Cleaning .AAE files:[/]"),
+        TextColumn("discovered [bold]{task.fields[discovered]}[/] | "
+                   f"{action.lower()} " "[bold green]{task.fields[deleted]}[/] | "
+                   "failed [bold red]{task.fields[failed]}[/]"),
+        TimeElapsedColumn(),
+        console=console
+    ) as progress:
+        task = progress.add_task("", total=None, discovered=0, deleted=0, failed=0)
+
+        def refresh() -> None:
+            progress.update(task, discovered=stats.discovered, deleted=stats.deleted, failed=stats.failed)
+
+        def worker() -> None:
+            while True:
+                entry = work_queue.get()
+                if entry is None:
+                    return
+                try:
+                    size = entry.stat(follow_symlinks=False).st_size
+                    if not dry_run:
+                        os.remove(entry.path)
+                    stats.add(deleted=1, bytes_freed=size)
+                except Exception as e:
+                    stats.add(failed_path=entry.path)
+                    console.log(f"[red]Error deleting {entry.path}:[/red] {e}")
+                finally:
+                    refresh()
+
+        threads = [threading.Thread(target=worker, daemon=True) for _ in range(max(1, workers))]
+        for thread in threads:
+            thread.start()
+        try:
+            for entry in entries:
+                stats.discovered += 1
+                work_queue.put(entry)
+                refresh()
+        finally:
+            for _ in threads:
+                work_queue.put(None)
+            for thread in threads:
+                thread.join()
+        refresh()
+
+    console.print(f"[bold]{action} {stats.deleted} of {stats.discovered} .AAE files "
+                  f"({decimal(stats.bytes_freed)}), {stats.failed} failed.[/bold]")
+    return stats
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Recursively delete Apple .AAE sidecar files.")
+    parser.add_argument("directory", nargs="?", help="Directory to clean up. Prompts when omitted.")
+    parser.add_argument("--dry-run", action="store_true", help="Only report what would be deleted and the bytes freed.")
+    parser.add_argument("--workers", type=int, default=4, help="Number of delete workers (default: 4).")
+    parser.add_argument("--rule", choices=RULES, default="all",
+                        help="all: delete every .AAE; orphaned: only those whose image is gone; "
+                             "paired: only those whose image still exists (default: all).")
+    parser.add_argument("--scan-workers", type=int, default=4,
+                        help="Number of directories listed in parallel (default: 4).")
+    parser.add_argument("--full", action="store_true", help="Ignore the directory index and rescan everything.")
+    parser.add_argument("--index", default=INDEX_FILE, help=f"Directory index file (default: {INDEX_FILE}).")
+    return parser.parse_args(argv)
+
+def main(argv: Optional[List[str]] = None):
     """Main function to execute the file cleanup process."""
-    target_directory = input("Enter the directory to clean up: ")
+    args = parse_args(argv)
+    target_directory = args.directory or input("Enter the directory to clean up: ")
     if not os.path.isdir(target_directory):
         console.print("[bold red]Invalid directory path.[/bold red]")
         return
     
     console.print(f"[bold cyan]Scanning {target_directory} for .AAE files...[/bold cyan]")
-    aae_files = find_aae_files(target_directory)
+    index = DirectoryIndex(target_directory, args.index, full=args.full, rule=args.rule)
+    sidecars = iter_aae_files(target_directory, index, rule=args.rule, workers=args.scan_workers)
+    stats = delete_files_streaming(sidecars, workers=args.workers, dry_run=args.dry_run)
+    console.print(f"[bold]Listed {index.scanned} directories, skipped {index.skipped} unchanged.[/bold]")
+
+    # A dry run must not mark directories as clean, or the next real run would skip them.
+    if not args.dry_run:
+        for failed_path in stats.failed_paths:
+            index.invalidate(os.path.dirname(os.path.abspath(failed_path)))
+        index.save()
     
-    if not aae_files:
+    if not stats.discovered:
         console.print("[bold yellow]No .AAE files found.[/bold yellow]")
         return
     
-    delete_files(aae_files)
     console.print("[bold green]Cleanup complete![/bold green]")
 
 if __name__ == "__main__":
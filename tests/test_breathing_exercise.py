@@ -0,0 +1,12 @@
+"""Command line parsing of the breathing exercise."""
+from breathing_exercise import build_parser
+
+
+def test_bare_render_picks_the_format_automatically():
+    args = build_parser().parse_args(["--render"])
+    assert args.render == "auto"
+
+
+def test_render_accepts_an_explicit_format():
+    assert build_parser().parse_args(["--render", "wav"]).render == "wav"
+    assert build_parser().parse_args([]).render is None
@@ -0,0 +1,102 @@
+"""Sync API batching of TodoistTaskManager against a local stand-in server."""
+import itertools
+import json
+import threading
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from todo_ist import TodoistSession, TodoistTaskManager
+
+
+class SyncHandler(BaseHTTPRequestHandler):
+    """
+    Applies item_add commands like the Sync API.
+
+    Contents containing "fail" are rejected, and so are items whose parent is a temp_id
+    that was not created in the same request.
+    """
+
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        body = urllib.parse.parse_qs(self.rfile.read(int(self.headers["Content-Length"])).decode())
+        commands = json.loads(body["commands"][0])
+        self.server.batches.append(commands)
+        sync_status, temp_id_mapping = {}, {}
+        for command in commands:
+            parent_id = command["args"].get("parent_id")
+            unknown_parent = parent_id is not None and not parent_id.isdigit() and parent_id not in temp_id_mapping
+            if "fail" in command["args"]["content"] or unknown_parent:
+                sync_status[command["uuid"]] = {"error_code": 15, "error": "Invalid temporary id"}
+            else:
+                sync_status[command["uuid"]] = "ok"
+                temp_id_mapping[command["temp_id"]] = str(next(self.server.ids))
+        payload = json.dumps({"sync_status": sync_status, "temp_id_mapping": temp_id_mapping}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+
+@pytest.fixture
+def manager():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), SyncHandler)
+    server.batches = []
+    server.ids = itertools.count(1000)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    task_manager = TodoistTaskManager(api_token="test-token", session=TodoistSession("test-token", max_retries=0))
+    task_manager.SYNC_URL = f"http://127.0.0.1:{server.server_port}/sync/v9/sync"
+    task_manager.server = server
+    yield task_manager
+    server.shutdown()
+    server.server_close()
+
+
+def subtasks(count, failing=()):
+    return {(f"fail {index}" if index in failing else f"Day {index}"): f"Description {index}"
+            for index in range(1, count + 1)}
+
+
+def test_commands_are_sent_in_chunks_of_sync_batch_size(manager):
+    results = manager.create_main_task_with_subtasks_batched("Main", "Main description", subtasks(250))
+
+    assert [len(batch) for batch in manager.server.batches] == [100, 100, 51]
+    assert len(results) == 251
+    assert all(result["id"] and result["error"] is None for result in results)
+    child_orders = [command["args"]["child_order"] for batch in manager.server.batches for command in batch[1:]
+                    if "child_order" in command["args"]]
+    assert child_orders == sorted(child_orders)
+
+
+def test_later_batches_use_the_real_main_task_id(manager):
+    results = manager.create_main_task_with_subtasks_batched("Main", "Main description", subtasks(150))
+
+    main_temp_id, main_id = results[0]["temp_id"], results[0]["id"]
+    first, second = manager.server.batches
+    assert "parent_id" not in first[0]["args"]
+    assert {command["args"]["parent_id"] for command in first[1:]} == {main_temp_id}
+    assert {command["args"]["parent_id"] for command in second} == {main_id}
+
+
+def test_item_errors_are_mapped_to_their_tasks(manager):
+    results = manager.create_main_task_with_subtasks_batched("Main", "", subtasks(120, failing={5, 110}))
+
+    failed = {result["content"]: result["error"] for result in results if result["error"]}
+    assert set(failed) == {"5. fail 5", "110. fail 110"}
+    assert failed["5. fail 5"]["error_code"] == 15
+    assert all(result["id"] is None for result in results if result["error"])
+    assert sum(1 for result in results if result["id"]) == 119
+
+
+def test_subtasks_are_not_sent_when_the_main_task_fails(manager):
+    results = manager.create_main_task_with_subtasks_batched("fail main", "", subtasks(150))
+
+    assert len(manager.server.batches) == 1
+    assert len(results) == 151
+    assert all(result["id"] is None for result in results[1:])
+    assert {result["error"] for result in results[101:]} == {"main task was not created"}
@@ -0,0 +1,108 @@
+"""Playlist page parsing against saved playlist pages."""
+import json
+import os
+
+import requests
+from pytube import extract
+
+import yt_playlist_to_md
+from yt_playlist_to_md import YouTubeClient, YouTubePlaylistExporter, extract_playlist_page, run_batch
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+PLAYLIST_URL = "https://www.youtube.com/playlist?list=PLfixture123"
+CONTINUATION_TOKEN = "4qmFsgKbARIkVkxQTGZpeHR1cmUxMjMaFENBRjZCbEJVT2tOSFVRJTNEJTNEmgIiUExmaXh0dXJlMTIz"
+
+
+def read_fixture(name):
+    with open(os.path.join(FIXTURES, name), "r", encoding="utf-8") as f:
+        return f.read()
+
+
+class FixtureClient(YouTubeClient):
+    """Serves the saved playlist page and continuation instead of calling YouTube."""
+
+    def __init__(self):
+        super().__init__(pool_size=1, retries=0)
+        self.posted = []
+
+    def get_text(self, url):
+        self._count()
+        return read_fixture("playlist_page.html")
+
+    def post_json(self, url, payload, headers=None):
+        self._count()
+        self.posted.append((url, payload))
+        return json.loads(read_fixture("playlist_continuation.json"))
+
+
+def test_initial_page_records_and_continuation_token():
+    data = extract.initial_data(read_fixture("playlist_page.html"))
+
+    records, continuation = extract_playlist_page(data)
+
+    assert [(r.video_id, r.position, r.title, r.duration) for r in records] == [
+        ("dQw4w9WgXcQ", 1, "Intro to the course", 212),
+        ("9bZkp7q19f0", 2, "Setting up", 1520),
+        ("kJQP7kiw5Fk", 3, "Première partie", None),
+    ]
+    assert continuation == CONTINUATION_TOKEN
+    assert not records[2].is_complete
+
+
+def test_continuation_page_positions_and_end_of_playlist():
+    data = json.loads(read_fixture("playlist_continuation.json"))
+
+    records, continuation = extract_playlist_page(data, start_position=4)
+
+    # The second video has no index, so it falls back to its position in the page.
+    assert [(r.video_id, r.position, r.duration) for r in records] == [("OPf0YbXqDm0", 4, 645), ("RgKAFK5djSk", 5, 98)]
+    assert continuation is None
+
+
+def test_exporter_follows_the_continuation(tmp_path):
+    client = FixtureClient()
+    exporter = YouTubePlaylistExporter(PLAYLIST_URL, output_dir=str(tmp_path), client=client, show_progress=False)
+
+    pages = list(exporter.iter_playlist_pages())
+
+    assert [[r.position for r in page] for page in pages] == [[1, 2, 3], [4, 5]]
+    (url, payload), = client.posted
+    assert "key=AIzaFixtureKey" in url
+    assert payload["continuation"] == CONTINUATION_TOKEN
+    assert exporter.playlist.title == "Fixture Course"
+
+
+class BrokenContinuationClient(FixtureClient):
+    """Serves the first playlist page, then fails on the continuation request."""
+
+    def post_json(self, url, payload, headers=None):
+        self._count()
+        raise requests.ConnectionError("connection reset")
+
+
+def test_failed_continuation_leaves_the_existing_file_untouched(tmp_path):
+    exporter = YouTubePlaylistExporter(PLAYLIST_URL, output_dir=str(tmp_path), client=FixtureClient(),
+                                       show_progress=False)
+    markdown_file, = exporter.run()
+    with open(markdown_file, "r", encoding="utf-8") as f:
+        complete = f.read()
+
+    for sync in (True, False):
+        broken = YouTubePlaylistExporter(PLAYLIST_URL, output_dir=str(tmp_path), client=BrokenContinuationClient(),
+                                         show_progress=False)
+        assert broken.run(sync=sync) == []
+        assert isinstance(broken.page_error, requests.ConnectionError)
+        with open(markdown_file, "r", encoding="utf-8") as f:
+            assert f.read() == complete
+    assert sorted(os.listdir(tmp_path)) == [".cache", os.path.basename(markdown_file)]
+
+
+def test_batch_index_links_the_written_format(tmp_path, monkeypatch):
+    monkeypatch.setattr(yt_playlist_to_md, "YouTubeClient", lambda pool_size: FixtureClient())
+
+    results = run_batch([PLAYLIST_URL], output_dir=str(tmp_path), formats=["csv"])
+
+    (url, files), = results
+    assert [os.path.basename(path) for path in files] == ["Fixture_Course_PLfixture123.csv"]
+    with open(os.path.join(tmp_path, "Playlists_Index.md"), "r", encoding="utf-8") as f:
+        assert "- [Fixture_Course_PLfixture123](Fixture_Course_PLfixture123.csv) (5 videos)" in f.read()
@@ -1,39 +1,224 @@
 import os
 import json
+import time
+import uuid
+import random
+import sqlite3
+import argparse
+import threading
+import functools
 import requests
 import configparser
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from requests.adapters import HTTPAdapter
 from tqdm import tqdm
-# Load configuration from Settings folder
+# Configuration lives in the Settings folder and is only read on first use
 CONFIG_DIR = "Settings"
 CONFIG_FILE = os.path.join(CONFIG_DIR, "todoist_config.ini")
 
-if not os.path.exists(CONFIG_DIR):
-    os.makedirs(CONFIG_DIR)
 
-config = configparser.ConfigParser()
-config.read(CONFIG_FILE)
-TODOIST_API_TOKEN = config.get("TODOIST", "API_TOKEN", fallback=None)
+@functools.lru_cache(maxsize=None)
+def get_api_token():
+    """Read the Todoist API token from the configuration file on first use."""
+    os.makedirs(CONFIG_DIR, exist_ok=True)
+    config = configparser.ConfigParser()
+    config.read(CONFIG_FILE)
+    api_token = config.get("TODOIST", "API_TOKEN", fallback=None)
+    if api_token is None:
+        raise ValueError("API Token not found in configuration file.")
+    return api_token
+
+class TokenBucket:
+    """
+    Thread-safe client-side throttle.
+
+    Allows bursts of up to `capacity` requests and refills at `rate` tokens per second.
+    """
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """Takes one token, sleeping until one is available. Returns the seconds waited."""
+        waited = 0.0
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return waited
+                delay = (1 - self.tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+
+class TodoistSession:
+    """
+    Shared HTTP transport for the Todoist API.
+
+    - Keep-alive connection pool and per-request timeouts.
+    - Retries connection errors, 429 and 5xx responses with exponential backoff and jitter,
+      honoring Retry-After.
+    - Client-side token bucket sized so that no `window_seconds` window can exceed
+      `requests_per_window` requests (half as burst, half as steady refill).
+    """
+    RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+    def __init__(self, api_token, timeout=(5, 30), max_retries=5, backoff_base=0.5, backoff_max=60.0,
+                 requests_per_window=450, window_seconds=15 * 60, pool_size=10):
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.bucket = TokenBucket(rate=requests_per_window / 2 / window_seconds, capacity=requests_per_window // 2)
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers["Authorization"] = f"Bearer {api_token}"
+        self.stats = {"requests": 0, "retries": 0, "throttle_waits": 0, "throttle_wait_seconds": 0.0}
+        self.stats_lock = threading.Lock()
+
+    def _count(self, key, value=1):
+        with self.stats_lock:
+            self.stats[key] += value
+
+    def _retry_delay(self, attempt, response=None):
+        """Seconds to wait before the next attempt: Retry-After if given, else backoff with full jitter."""
+        retry_after = response.headers.get("Retry-After") if response is not None else None
+        if retry_after:
+            try:
+                return float(retry_after)
+            except ValueError:
+                pass
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    def request(self, method, url, **kwargs):
+        """Sends a request with throttling and retries. Raises requests exceptions like requests does."""
+        headers = kwargs.pop("headers", {})
+        if method.upper() == "POST":
+            # Lets Todoist drop duplicates if a retried POST was in fact applied.
+            headers.setdefault("X-Request-Id", str(uuid.uuid4()))
+        for attempt in range(self.max_retries + 1):
+            waited = self.bucket.acquire()
+            if waited:
+                self._count("throttle_waits")
+                self._count("throttle_wait_seconds", waited)
+            self._count("requests")
+            try:
+                response = self.session.request(method, url, headers=headers, timeout=self.timeout, **kwargs)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+                if attempt == self.max_retries:
+                    raise
+                delay = self._retry_delay(attempt)
+            else:
+                if response.status_code not in self.RETRY_STATUSES or attempt == self.max_retries:
+                    response.raise_for_status()
+                    return response
+                delay = self._retry_delay(attempt, response)
+            self._count("retries")
+            time.sleep(delay)
+
+    def get(self, url, **kwargs):
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request("POST", url, **kwargs)
+
+
+class TaskStore:
+    """
+    Local SQLite copy of Todoist tasks keyed by task id, kept current with Sync API deltas.
+    """
+
+    def __init__(self, db_path):
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        self.conn = sqlite3.connect(db_path)
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS tasks (
+                id TEXT PRIMARY KEY, content TEXT, project_id TEXT, section_id TEXT, parent_id TEXT,
+                checked INTEGER, due_date TEXT, data TEXT);
+            CREATE INDEX IF NOT EXISTS tasks_project ON tasks (project_id);
+            CREATE INDEX IF NOT EXISTS tasks_due ON tasks (due_date);
+            CREATE TABLE IF NOT EXISTS task_labels (task_id TEXT, label TEXT, PRIMARY KEY (label, task_id));
+            CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+        """)
+
+    @property
+    def sync_token(self):
+        row = self.conn.execute("SELECT value FROM meta WHERE key = 'sync_token'").fetchone()
+        return row[0] if row else "*"
+
+    def apply_sync(self, items, sync_token, full_sync=False):
+        """Upsert changed items, drop deleted ones and store the new sync token in one transaction."""
+        with self.conn:
+            if full_sync:
+                self.conn.execute("DELETE FROM tasks")
+                self.conn.execute("DELETE FROM task_labels")
+            for item in items:
+                task_id = str(item["id"])
+                self.conn.execute("DELETE FROM task_labels WHERE task_id = ?", (task_id,))
+                if item.get("is_deleted"):
+                    self.conn.execute("DELETE FROM tasks WHERE id = ?", (task_id,))
+                    continue
+                due = item.get("due") or {}
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO tasks VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (task_id, item.get("content"), item.get("project_id"), item.get("section_id"),
+                     item.get("parent_id"), int(bool(item.get("checked"))), (due.get("date") or "")[:10] or None,
+                     json.dumps(item, separators=(",", ":"))),
+                )
+                self.conn.executemany("INSERT OR IGNORE INTO task_labels VALUES (?, ?)",
+                                      [(task_id, label) for label in item.get("labels", [])])
+            self.conn.execute("INSERT OR REPLACE INTO meta VALUES ('sync_token', ?)", (sync_token,))
+
+    def _query(self, sql, params=()):
+        return [json.loads(row[0]) for row in self.conn.execute(sql, params)]
+
+    def by_project(self, project_id):
+        return self._query("SELECT data FROM tasks WHERE project_id = ?", (project_id,))
+
+    def by_label(self, label):
+        return self._query(
+            "SELECT t.data FROM task_labels l JOIN tasks t ON t.id = l.task_id WHERE l.label = ?", (label,))
+
+    def due_between(self, start_date, end_date):
+        """Tasks due between two YYYY-MM-DD dates, inclusive."""
+        return self._query("SELECT data FROM tasks WHERE due_date BETWEEN ? AND ? ORDER BY due_date",
+                           (start_date, end_date))
+
+    def count(self):
+        return self.conn.execute("SELECT COUNT(*) FROM tasks").fetchone()[0]
+
+    def close(self):
+        self.conn.close()
 
-if TODOIST_API_TOKEN is None:
-    raise ValueError("API Token not found in configuration file.")
 
 class TodoistTaskManager:
     """
     A manager class to handle fetching and saving tasks from Todoist API using SOLID principles.
     """
     API_URL = "https://api.todoist.com/rest/v2/tasks"
+    SYNC_URL = "https://api.todoist.com/sync/v9/sync"
+    SYNC_BATCH_SIZE = 100  # Maximum number of commands per Sync API request
     OUTPUT_DIR = "output/todoist"
     OUTPUT_FILE = os.path.join(OUTPUT_DIR, "tasks.json")
+    STORE_FILE = os.path.join(OUTPUT_DIR, "tasks.sqlite")
 
-    def __init__(self, api_token):
-        self.api_token = api_token
+    def __init__(self, api_token=None, session=None):
+        self.api_token = api_token or get_api_token()
+        self.session = session or TodoistSession(self.api_token)
 
     def fetch_todoist_tasks(self):
         """Fetch tasks from Todoist API."""
         try:
-            headers = {"Authorization": f"Bearer {self.api_token}"}
-            response = requests.get(self.API_URL, headers=headers)
-            response.raise_for_status()
+            response = self.session.get(self.API_URL)
             return response.json()
         except requests.exceptions.RequestException as e:
             print(f"Error fetching tasks: {e}")
@@ -49,44 +234,227 @@ class TodoistTaskManager:
         except (OSError, IOError) as e:
             print(f"Error saving tasks to file: {e}")
 
-    def create_task(self, task_name, task_description, parent_id=None):
+    def _post_task(self, task_name, task_description, parent_id=None, order=None, request_id=None):
+        """POST one task to the REST API. Raises requests exceptions on failure."""
+        data = {"content": task_name, "description": task_description}
+        if parent_id:
+            data["parent_id"] = parent_id
+        if order is not None:
+            data["order"] = order
+        headers = {"X-Request-Id": request_id} if request_id else {}
+        response = self.session.post(self.API_URL, json=data, headers=headers)
+        return response.json()
+
+    def create_task(self, task_name, task_description, parent_id=None, order=None, request_id=None):
         """Create a task in Todoist."""
         try:
-            headers = {"Authorization": f"Bearer {self.api_token}", "Content-Type": "application/json"}
-            data = {"content": task_name, "description": task_description}
-            if parent_id:
-                data["parent_id"] = parent_id
-            response = requests.post(self.API_URL, headers=headers, json=data)
-            response.raise_for_status()
-            return response.json()
+            return self._post_task(task_name, task_description, parent_id, order, request_id)
         except requests.exceptions.RequestException as e:
             print(f"Error creating task: {e}")
             return None
 
-    def create_main_task_with_subtasks(self, main_task_name, main_task_description, subtask_data):
-        """Create a main task with subtasks in Todoist."""
+    def _try_create_subtask(self, task_name, task_description, parent_id, order, request_id):
+        """
+        Create one subtask and return (task, error, retryable).
+
+        Only transport errors and 429/5xx responses are retryable; other HTTP errors such as
+        400 or 403 will fail the same way again.
+        """
         try:
-            main_task = self.create_task(main_task_name, main_task_description)
-            if main_task:
-                main_task_id = main_task.get("id")
-                with tqdm(
-                    total=len(subtask_data.items()),
-                    desc="Adding Sub Tasks", 
-                    bar_format="{l_bar}{bar:20} {n_fmt}/{total_fmt} [elapsed: {elapsed} | remaining: {remaining} | avg: {rate_fmt}] {postfix}",
-                    dynamic_ncols=True
-                ) as progress_bar:
-                    for index, (title, description) in enumerate(subtask_data.items(), start=1):
-                        try:
-                            self.create_task(f"{index}. {title}", description, parent_id=main_task_id)
-                            task_name = f"Task {index}. {title}"
-                            progress_bar.set_postfix({"Added": task_name})
-                        finally:
-                            progress_bar.update(1)
-        except Exception as e:
-            print(f"Error creating main task with subtasks: {e}")
+            return self._post_task(task_name, task_description, parent_id, order, request_id), None, False
+        except requests.exceptions.HTTPError as e:
+            status = e.response.status_code if e.response is not None else None
+            return None, str(e), status is None or status in TodoistSession.RETRY_STATUSES
+        except requests.exceptions.RequestException as e:
+            return None, str(e), True
 
-    def download_tasks(self):
-        """Fetch and save tasks."""
+    @staticmethod
+    def _task_result(content, task_id=None, error=None, temp_id=None):
+        """One entry of the results returned when creating tasks; temp_id is only set by the Sync API."""
+        return {"content": content, "temp_id": temp_id, "id": task_id, "error": error}
+
+    def create_main_task_with_subtasks(self, main_task_name, main_task_description, subtask_data, batch=False,
+                                       max_workers=8, max_attempts=3):
+        """
+        Create a main task with subtasks in Todoist.
+
+        With batch=True, the Sync API command queue is used. Otherwise subtasks are created through the
+        REST API on up to `max_workers` threads (still bounded by the session's rate limit).
+
+        Either way, returns a list with one result per task (main task first):
+        {"content", "temp_id", "id", "error"} where id is None and error is set on failure.
+        """
+        if batch:
+            return self.create_main_task_with_subtasks_batched(main_task_name, main_task_description, subtask_data)
+        try:
+            main_task = self._post_task(main_task_name, main_task_description)
+        except requests.exceptions.RequestException as e:
+            print(f"Error creating task {main_task_name}: {e}")
+            return [self._task_result(main_task_name, error=str(e))] + [
+                self._task_result(f"{index}. {title}", error="main task was not created")
+                for index, title in enumerate(subtask_data, start=1)
+            ]
+        main_result = self._task_result(main_task_name, main_task.get("id"))
+        return [main_result] + self.create_subtasks(main_result["id"], subtask_data, max_workers, max_attempts)
+
+    def create_subtasks(self, main_task_id, subtask_data, max_workers=8, max_attempts=3):
+        """
+        Create numbered subtasks under a task, concurrently.
+
+        Each subtask gets an explicit order, so "1.", "2.", ... stay in sequence regardless of
+        completion order. Subtasks that failed on transport errors or 429/5xx responses are retried
+        up to `max_attempts` times in total, reusing one X-Request-Id per subtask so Todoist drops a
+        retried POST that was in fact applied.
+
+        Returns one {"content", "temp_id", "id", "error"} result per subtask, in subtask order;
+        the ones that still failed are also reported.
+        """
+        pending = list(enumerate(subtask_data.items(), start=1))
+        request_ids = {index: str(uuid.uuid4()) for index, _ in pending}
+        results = {}
+        with tqdm(
+            total=len(pending),
+            desc="Adding Sub Tasks", 
+            bar_format="{l_bar}{bar:20} {n_fmt}/{total_fmt} [elapsed: {elapsed} | remaining: {remaining} | avg: {rate_fmt}] {postfix}",
+            dynamic_ncols=True
+        ) as progress_bar, ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+            for attempt in range(1, max_attempts + 1):
+                futures = {
+                    executor.submit(self._try_create_subtask, f"{index}. {title}", description,
+                                    main_task_id, index, request_ids[index]): (index, (title, description))
+                    for index, (title, description) in pending
+                }
+                failed = []
+                for future in as_completed(futures):
+                    index, (title, description) = futures[future]
+                    task, error, retryable = future.result()
+                    results[index] = self._task_result(f"{index}. {title}", task and task.get("id"), error)
+                    if task:
+                        progress_bar.set_postfix({"Added": f"Task {index}. {title}"})
+                        progress_bar.update(1)
+                    elif retryable:
+                        failed.append((index, (title, description)))
+                    else:
+                        results[index]["error"] = f"rejected by the API ({error})"
+                if not failed:
+                    break
+                pending = sorted(failed)
+                if attempt < max_attempts:
+                    progress_bar.set_postfix({"Retrying": len(pending)})
+                else:
+                    for index, _ in failed:
+                        results[index]["error"] = f"failed after {max_attempts} attempts ({results[index]['error']})"
+
+        results = [results[index] for index in sorted(results)]
+        for result in results:
+            if result["error"]:
+                print(f"Failed to create subtask {result['content']}: {result['error']}")
+        print(f"Transport stats: {self.session.stats}")
+        return results
+
+    def send_sync_commands(self, commands):
+        """Send one batch of Sync API commands and return the parsed response."""
+        response = self.session.post(self.SYNC_URL, data={"commands": json.dumps(commands)})
+        return response.json()
+
+    @staticmethod
+    def _item_add_command(content, description, parent_id=None, child_order=None):
+        """Build an item_add Sync API command with fresh temp_id and uuid."""
+        args = {"content": content, "description": description}
+        if parent_id:
+            args["parent_id"] = parent_id
+        if child_order is not None:
+            args["child_order"] = child_order
+        return {"type": "item_add", "temp_id": str(uuid.uuid4()), "uuid": str(uuid.uuid4()), "args": args}
+
+    def create_main_task_with_subtasks_batched(self, main_task_name, main_task_description, subtask_data):
+        """
+        Create a main task with subtasks through the Sync API, up to SYNC_BATCH_SIZE commands per request.
+
+        Subtasks reference the main task by its temp_id; once the first batch has been applied,
+        later batches use the real id from temp_id_mapping.
+
+        Returns a list with one result per task (main task first):
+        {"content", "temp_id", "id", "error"} where id is None and error is set on failure.
+        """
+        main_command = self._item_add_command(main_task_name, main_task_description)
+        main_temp_id = main_command["temp_id"]
+        commands = [main_command] + [
+            self._item_add_command(f"{index}. {title}", description, parent_id=main_temp_id, child_order=index)
+            for index, (title, description) in enumerate(subtask_data.items(), start=1)
+        ]
+
+        results = []
+        main_task_id = None
+        with tqdm(
+            total=len(commands),
+            desc="Adding Tasks (batched)",
+            bar_format="{l_bar}{bar:20} {n_fmt}/{total_fmt} [elapsed: {elapsed} | remaining: {remaining} | avg: {rate_fmt}] {postfix}",
+            dynamic_ncols=True
+        ) as progress_bar:
+            for start in range(0, len(commands), self.SYNC_BATCH_SIZE):
+                batch = commands[start:start + self.SYNC_BATCH_SIZE]
+                if start and main_task_id is None:
+                    error = "main task was not created"
+                    results.extend(self._task_result(c["args"]["content"], error=error, temp_id=c["temp_id"])
+                                   for c in commands[start:])
+                    break
+                for command in batch:
+                    if command["args"].get("parent_id") == main_temp_id and main_task_id:
+                        command["args"]["parent_id"] = main_task_id
+
+                try:
+                    response = self.send_sync_commands(batch)
+                except (requests.exceptions.RequestException, ValueError) as e:
+                    response = {"error": str(e)}
+                sync_status = response.get("sync_status", {})
+                temp_id_mapping = response.get("temp_id_mapping", {})
+
+                for command in batch:
+                    status = sync_status.get(command["uuid"], response.get("error", "no status returned"))
+                    created_id = temp_id_mapping.get(command["temp_id"]) if status == "ok" else None
+                    results.append(self._task_result(command["args"]["content"], created_id,
+                                                     None if created_id else status, command["temp_id"]))
+                if start == 0:
+                    main_task_id = results[0]["id"]
+                progress_bar.set_postfix({"Failed": sum(1 for r in results if r["error"])})
+                progress_bar.update(len(batch))
+
+        failed = [r for r in results if r["error"]]
+        for result in failed:
+            print(f"Error creating task {result['content']}: {result['error']}")
+        print(f"Created {len(results) - len(failed)}/{len(commands)} tasks. Transport stats: {self.session.stats}")
+        return results
+
+    def sync_tasks(self, store=None):
+        """
+        Incrementally sync tasks into the local TaskStore using Sync API sync_token deltas.
+
+        The first call performs a full sync; later calls only transfer and write changed tasks.
+        Returns the number of changed tasks, or None on error.
+        """
+        owns_store = store is None
+        store = store or TaskStore(self.STORE_FILE)
+        try:
+            response = self.session.post(
+                self.SYNC_URL, data={"sync_token": store.sync_token, "resource_types": json.dumps(["items"])}
+            ).json()
+            items = response.get("items", [])
+            store.apply_sync(items, response["sync_token"], full_sync=response.get("full_sync", False))
+            kind = "full" if response.get("full_sync") else "incremental"
+            print(f"Synced {len(items)} changed tasks ({kind}); {store.count()} tasks stored in {self.STORE_FILE}")
+            return len(items)
+        except (requests.exceptions.RequestException, ValueError, KeyError) as e:
+            print(f"Error syncing tasks: {e}")
+            return None
+        finally:
+            if owns_store:
+                store.close()
+
+    def download_tasks(self, incremental=False):
+        """Fetch and save tasks. With incremental=True, only changes are synced into the local task store."""
+        if incremental:
+            return self.sync_tasks()
         try:
             tasks = self.fetch_todoist_tasks()
             self.save_tasks_to_file(tasks)
@@ -94,22 +462,33 @@ class TodoistTaskManager:
         except Exception as e:
             print(f"Error in downloading tasks: {e}")
 
-if __name__ == "__main__":
-    from date_todo_ist import generate_sub_task
-    main_task_name = "Copy Folder Itmes"
-    main_task_description = "Copy Folder Itmes"
-    sub_task = generate_sub_task("2024-01","2025-01")
-    manager = TodoistTaskManager(TODOIST_API_TOKEN)
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Download, sync or create Todoist tasks.")
+    parser.add_argument("action", nargs="?", default="create_task",
+                        choices=["create_task", "download_tasks", "sync_tasks"],
+                        help="create_task (default), download_tasks, or sync_tasks for an incremental download")
+    parser.add_argument("--batch", action="store_true",
+                        help="create_task: create the subtasks through the Sync API instead of the REST API")
+    args = parser.parse_args(argv)
+    action = args.action
+    manager = TodoistTaskManager()
 
-    action = "create_task"  # Change this to "create_task" for task creation
-
-    if action == "download_tasks":
+    if action == "sync_tasks":
+        manager.download_tasks(incremental=True)
+    elif action == "download_tasks":
         try:
             manager.download_tasks()
         except Exception as e:
             print(f"Unexpected error: {e}")
     elif action == "create_task":
+        from date_todo_ist import generate_sub_task
+        main_task_name = "Copy Folder Itmes"
+        main_task_description = "Copy Folder Itmes"
+        sub_task = generate_sub_task("2024-01","2025-01")
         try:
-            manager.create_main_task_with_subtasks(main_task_name, main_task_description, sub_task)
+            manager.create_main_task_with_subtasks(main_task_name, main_task_description, sub_task, batch=args.batch)
         except Exception as e:
             print(f"Error creating tasks: {e}")
+
+if __name__ == "__main__":
+    main()
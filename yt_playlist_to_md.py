@@ -7,15 +7,22 @@ provides a checklist format with video links, making it useful for tracking
 progress when watching a playlist.
 
 Features:
-- Fetches video titles and URLs from a given YouTube playlist.
+- Fetches video titles, ids, durations and positions from the playlist pages themselves
+  (about one request per 100 videos); single videos are only fetched when a field is missing,
+  concurrently over a shared, retrying HTTP session.
 - Saves the playlist as a Markdown file (`.md`) with a checkbox list.
-- Optionally exports the playlist to an Excel file (`.xlsx`).
+- Sync mode merges new videos into an existing Markdown file, keeping ticked boxes and marking
+  removed videos instead of deleting them; video metadata is cached per output directory.
+- Optionally exports the playlist to Excel (`.xlsx`), CSV and JSON Lines files. All outputs are
+  written while the videos are being fetched and are named after the playlist title and id.
 - Supports configurable output directories for better reusability.
 - Ensures filenames are sanitized for cross-platform compatibility.
 - Structured using the SOLID principles for maintainability and extensibility.
 
 Usage:
 1. Run the script, provide a YouTube playlist URL, and choose whether to export Excel.
+   For several playlists, run it with `--batch urls.txt` (one URL per line); pick the
+   outputs with e.g. `--formats md,csv,jsonl`.
 2. The Markdown and Excel files will be saved inside the `output/youtube_playlist_to_md/` folder by default.
 3. The script can also be imported as a module in other Python tools for further automation.
 
@@ -23,26 +30,417 @@ Usage:
 
 import os
 import re , time
-import pandas as pd
-from pytube import Playlist
+import csv
+import json
+import argparse
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from collections import deque
+from dataclasses import asdict, dataclass
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from pytube import Playlist, extract
 from pytube.exceptions import PytubeError
 from tqdm import tqdm
 
+BROWSE_URL = "https://www.youtube.com/youtubei/v1/browse?key={api_key}"
+CLIENT_VERSION = "2.20200720.00.02"
+REMOVED_HEADING = "## Removed from playlist"
+METADATA_CACHE_NAME = "videos.json"  # In <output_dir>/.cache, shared by all playlists
+CHECKLIST_LINE = re.compile(
+    r"^- \[(?P<mark>[ xX])\] (?:~~)?\[(?P<title>.*)\]\((?P<url>[^)]*[?&]v=(?P<video_id>[\w-]+)[^)]*)\)"
+)
+
+
+@dataclass
+class VideoRecord:
+    """Metadata of one playlist entry."""
+    video_id: str
+    position: int
+    title: Optional[str] = None
+    duration: Optional[int] = None  # Seconds
+
+    @property
+    def url(self) -> str:
+        return f"https://www.youtube.com/watch?v={self.video_id}"
+
+    @property
+    def is_complete(self) -> bool:
+        return bool(self.title) and self.duration is not None
+
+
+def _text(node: Optional[dict]) -> Optional[str]:
+    """Returns the text of a YouTube text node ({"simpleText": ...} or {"runs": [...]})."""
+    if not node:
+        return None
+    if "simpleText" in node:
+        return node["simpleText"]
+    runs = node.get("runs") or []
+    return "".join(run.get("text", "") for run in runs) or None
+
+
+def parse_video_renderer(renderer: dict, fallback_position: int) -> Optional[VideoRecord]:
+    """Builds a VideoRecord from a playlistVideoRenderer; returns None if it has no video id."""
+    video_id = renderer.get("videoId")
+    if not video_id:
+        return None
+    try:
+        position = int(_text(renderer.get("index")))
+    except (TypeError, ValueError):
+        position = fallback_position
+    try:
+        duration = int(renderer["lengthSeconds"])
+    except (KeyError, TypeError, ValueError):
+        duration = None
+    return VideoRecord(video_id=video_id, position=position, title=_text(renderer.get("title")), duration=duration)
+
+
+def extract_playlist_page(data: dict, start_position: int = 1) -> Tuple[List[VideoRecord], Optional[str]]:
+    """
+    Extracts the video records and continuation token from one page of playlist data.
+
+    Works on both the page's initial data and continuation responses, by walking
+    the JSON tree for playlistVideoRenderer and continuationItemRenderer nodes.
+    """
+    records = []
+    continuation = None
+    stack = [data]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, list):
+            stack.extend(reversed(node))
+        elif isinstance(node, dict):
+            if "playlistVideoRenderer" in node:
+                record = parse_video_renderer(node["playlistVideoRenderer"], start_position + len(records))
+                if record:
+                    records.append(record)
+            elif "continuationItemRenderer" in node:
+                command = node["continuationItemRenderer"].get("continuationEndpoint", {}).get("continuationCommand", {})
+                continuation = command.get("token", continuation)
+            else:
+                stack.extend(reversed(list(node.values())))
+    return records, continuation
+
+def read_checklist(markdown_file: str) -> Dict[str, Tuple[bool, str]]:
+    """
+    Reads the checklist of a previously exported playlist.
+
+    :returns: video id -> (checked, title), in file order. Empty if the file does not exist.
+    """
+    entries = {}
+    if not os.path.exists(markdown_file):
+        return entries
+    with open(markdown_file, "r", encoding="utf-8") as md_file:
+        for line in md_file:
+            match = CHECKLIST_LINE.match(line)
+            if match:
+                entries[match.group("video_id")] = (match.group("mark") in "xX", match.group("title"))
+    return entries
+
+
+class YouTubeClient:
+    """
+    Shared HTTP session for YouTube requests.
+
+    Keeps a keep-alive connection pool sized for the worker threads, retries
+    connection errors, 429 and 5xx responses with exponential backoff (honoring
+    Retry-After) and counts the requests it sends.
+    """
+
+    def __init__(self, pool_size: int = 8, retries: int = 4, backoff: float = 0.5, timeout: float = 15.0):
+        self.timeout = timeout
+        self.session = requests.Session()
+        retry = Retry(total=retries, backoff_factor=backoff, status_forcelist=(429, 500, 502, 503, 504),
+                      allowed_methods=None, respect_retry_after_header=True)
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers.update({"User-Agent": "Mozilla/5.0", "Accept-Language": "en-US,en"})
+        self.request_count = 0
+        self._lock = threading.Lock()
+
+    def _count(self) -> None:
+        with self._lock:
+            self.request_count += 1
+
+    def get_text(self, url: str) -> str:
+        self._count()
+        response = self.session.get(url, timeout=self.timeout)
+        response.raise_for_status()
+        return response.text
+
+    def post_json(self, url: str, payload: dict, headers: Optional[dict] = None) -> dict:
+        self._count()
+        response = self.session.post(url, json=payload, headers=headers, timeout=self.timeout)
+        response.raise_for_status()
+        return response.json()
+
+
+class VideoMetadataCache:
+    """
+    Video metadata shared by several exporters, keyed by video id.
+
+    A video that appears in several playlists is fetched once: concurrent requests
+    for the same id wait for the first fetch instead of repeating it.
+    """
+
+    def __init__(self, cache_file: Optional[str] = None):
+        self.cache_file = cache_file
+        self.entries: Dict[str, dict] = {}
+        self.hits = 0
+        self.misses = 0
+        self._pending: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+        if cache_file and os.path.exists(cache_file):
+            try:
+                with open(cache_file, "r", encoding="utf-8") as f:
+                    self.entries = json.load(f)
+            except (OSError, ValueError) as e:
+                print(f"Ignoring unreadable video cache {cache_file}: {e}")
+
+    @staticmethod
+    def _apply(record: VideoRecord, entry: dict) -> VideoRecord:
+        record.title = record.title or entry.get("title")
+        if record.duration is None:
+            record.duration = entry.get("duration")
+        return record
+
+    def complete(self, record: VideoRecord, fetch) -> VideoRecord:
+        """Fills missing fields of `record` from the cache, calling fetch(record) only on the first miss."""
+        with self._lock:
+            entry = self.entries.get(record.video_id)
+            if entry:
+                self.hits += 1
+                return self._apply(record, entry)
+            future = self._pending.get(record.video_id)
+            owner = future is None
+            if owner:
+                future = self._pending[record.video_id] = Future()
+                self.misses += 1
+            else:
+                self.hits += 1
+        if not owner:
+            return self._apply(record, future.result())
+
+        try:
+            fetch(record)
+        except Exception as e:
+            with self._lock:
+                del self._pending[record.video_id]
+            future.set_exception(e)
+            raise
+        entry = {"title": record.title, "duration": record.duration}
+        with self._lock:
+            if record.is_complete:
+                self.entries[record.video_id] = entry
+            del self._pending[record.video_id]
+        future.set_result(entry)
+        return record
+
+    def save(self) -> None:
+        if not self.cache_file:
+            return
+        os.makedirs(os.path.dirname(self.cache_file) or ".", exist_ok=True)
+        with self._lock, open(self.cache_file, "w", encoding="utf-8") as f:
+            json.dump(self.entries, f)
+
+
+class PlaylistSink:
+    """
+    Writes video records to one output file as they arrive.
+
+    Records go to `<path>.tmp`, which replaces `path` on close, so an interrupted
+    export never leaves a truncated file behind.
+    """
+    extension = ""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.tmp_file = f"{path}.tmp"
+        self.count = 0
+
+    def open(self) -> "PlaylistSink":
+        return self
+
+    def write(self, record: VideoRecord) -> None:
+        self.count += 1
+
+    def _finish(self) -> None:
+        """Flushes and closes the temporary file."""
+
+    def close(self) -> str:
+        """Finishes the file and moves it into place; returns its path."""
+        self._finish()
+        os.replace(self.tmp_file, self.path)
+        return self.path
+
+    def abort(self) -> None:
+        """Discards the partially written file."""
+        try:
+            self._finish()
+        finally:
+            if os.path.exists(self.tmp_file):
+                os.remove(self.tmp_file)
+
+
+class MarkdownSink(PlaylistSink):
+    """
+    Markdown checklist of the playlist.
+
+    With `existing` (the checklist read from the current file), ticked boxes are kept and
+    videos that left the playlist are listed under REMOVED_HEADING on close.
+    """
+    extension = "md"
+
+    def __init__(self, path: str, existing: Optional[Dict[str, Tuple[bool, str]]] = None):
+        super().__init__(path)
+        self.existing = existing or {}
+        self.seen_ids = set()
+        self.added = 0
+        self.removed = 0
+        self._file = None
+
+    def open(self) -> "MarkdownSink":
+        self._file = open(self.tmp_file, "w", encoding="utf-8")
+        self._file.write("# Playlist\n\n")
+        return self
+
+    def write(self, record: VideoRecord) -> None:
+        super().write(record)
+        self.seen_ids.add(record.video_id)
+        if record.video_id in self.existing:
+            checked = self.existing[record.video_id][0]
+        else:
+            checked = False
+            self.added += 1
+        self._file.write(f"- [{'x' if checked else ' '}] [{record.title or record.url}]({record.url})\n")
+
+    def close(self) -> str:
+        removed = [(video_id, entry) for video_id, entry in self.existing.items() if video_id not in self.seen_ids]
+        if removed:
+            self._file.write(f"\n{REMOVED_HEADING}\n\n")
+            for video_id, (checked, title) in removed:
+                url = f"https://www.youtube.com/watch?v={video_id}"
+                self._file.write(f"- [{'x' if checked else ' '}] ~~[{title}]({url})~~\n")
+        self.removed = len(removed)
+        return super().close()
+
+    def _finish(self) -> None:
+        if self._file:
+            self._file.close()
+
+
+class CsvSink(PlaylistSink):
+    """CSV table with one row per video."""
+    extension = "csv"
+    HEADER = ["Position", "Video Name", "Video URL", "Duration (s)"]
+
+    def __init__(self, path: str):
+        super().__init__(path)
+        self._file = None
+        self._writer = None
+
+    def open(self) -> "CsvSink":
+        self._file = open(self.tmp_file, "w", encoding="utf-8", newline="")
+        self._writer = csv.writer(self._file)
+        self._writer.writerow(self.HEADER)
+        return self
+
+    def write(self, record: VideoRecord) -> None:
+        super().write(record)
+        self._writer.writerow([record.position, record.title or record.url, record.url,
+                               "" if record.duration is None else record.duration])
+
+    def _finish(self) -> None:
+        if self._file:
+            self._file.close()
+
+
+class JsonlSink(PlaylistSink):
+    """JSON Lines file with one object per video."""
+    extension = "jsonl"
+
+    def __init__(self, path: str):
+        super().__init__(path)
+        self._file = None
+
+    def open(self) -> "JsonlSink":
+        self._file = open(self.tmp_file, "w", encoding="utf-8")
+        return self
+
+    def write(self, record: VideoRecord) -> None:
+        super().write(record)
+        self._file.write(json.dumps({**asdict(record), "url": record.url}, ensure_ascii=False) + "\n")
+
+    def _finish(self) -> None:
+        if self._file:
+            self._file.close()
+
+
+class XlsxSink(PlaylistSink):
+    """Excel sheet written with openpyxl's write-only mode, which streams rows to disk."""
+    extension = "xlsx"
+
+    def __init__(self, path: str):
+        super().__init__(path)
+        self._workbook = None
+        self._sheet = None
+
+    def open(self) -> "XlsxSink":
+        from openpyxl import Workbook  # Only needed for the optional Excel export
+
+        self._workbook = Workbook(write_only=True)
+        self._sheet = self._workbook.create_sheet("Playlist")
+        self._sheet.append(CsvSink.HEADER)
+        return self
+
+    def write(self, record: VideoRecord) -> None:
+        super().write(record)
+        self._sheet.append([record.position, record.title or record.url, record.url, record.duration])
+
+    def _finish(self) -> None:
+        if self._workbook:
+            self._workbook.save(self.tmp_file)
+            self._workbook = None
+
+
+# Output format -> sink class
+SINKS = {sink.extension: sink for sink in (MarkdownSink, XlsxSink, CsvSink, JsonlSink)}
+
+
 class YouTubePlaylistExporter:
-    """Exports YouTube playlists to Markdown and optionally Excel."""
+    """Exports YouTube playlists to Markdown and optionally Excel, CSV or JSON Lines."""
 
-    def __init__(self, playlist_url: str, output_dir: str = "output/youtube_playlist_to_md", export_excel: bool = False):
+    def __init__(self, playlist_url: str, output_dir: str = "output/youtube_playlist_to_md", export_excel: bool = False,
+                 client: Optional[YouTubeClient] = None, workers: int = 8,
+                 metadata_cache: Optional[VideoMetadataCache] = None, show_progress: bool = True,
+                 formats: Iterable[str] = ("md",)):
         """
         Initializes the exporter.
 
         :param playlist_url: The URL of the YouTube playlist.
         :param output_dir: The directory where output files will be saved.
         :param export_excel: Boolean flag to indicate if Excel output is needed.
+        :param client: Shared HTTP client; a new one is created when omitted.
+        :param workers: Number of threads for per-video fallback fetches.
+        :param metadata_cache: Video metadata shared with other exporters (batch mode); otherwise
+            run(sync=True) uses the output directory's cache file.
+        :param show_progress: Show the per-playlist progress bar.
+        :param formats: Output formats written by run(), any of SINKS ("md", "xlsx", "csv", "jsonl").
         """
         self.playlist_url = playlist_url
         self.output_dir = output_dir
         self.export_excel = export_excel
-        self.video_data = {}
+        self.client = client or YouTubeClient(pool_size=workers)
+        self.workers = workers
+        self.metadata_cache = metadata_cache
+        self.show_progress = show_progress
+        self.formats = list(dict.fromkeys([*formats, *(["xlsx"] if export_excel else [])]))
+        self.video_data: List[VideoRecord] = []  # Playlist order, one record per video id (fetch_videos only)
+        self.video_count = 0
+        self.page_error: Optional[Exception] = None  # Set when a playlist page could not be read
 
         try:
             self.playlist = Playlist(self.playlist_url)
@@ -65,91 +463,360 @@ class YouTubePlaylistExporter:
 
 
 
-    def fetch_videos(self) -> None:
-        """Fetches video titles and URLs with a compact progress bar and dynamic comments."""
-        if not self.playlist:
+    def _load_playlist_page(self) -> None:
+        """Fetches the playlist page through the shared client, so pytube does not request it again."""
+        if not self.playlist._html:
+            self.playlist._html = self.client.get_text(self.playlist.playlist_url)
+
+    def _fetch_continuation(self, continuation: str) -> dict:
+        """Requests the next page (up to 100 videos) of the playlist."""
+        data = {"continuation": continuation,
+                "context": {"client": {"clientName": "WEB", "clientVersion": CLIENT_VERSION}}}
+        headers = {"X-YouTube-Client-Name": "1", "X-YouTube-Client-Version": CLIENT_VERSION}
+        return self.client.post_json(BROWSE_URL.format(api_key=self.playlist.yt_api_key), data, headers)
+
+    def iter_playlist_pages(self) -> Iterator[List[VideoRecord]]:
+        """Yields the video records of the playlist page by page, straight from the playlist data."""
+        self._load_playlist_page()
+        records, continuation = extract_playlist_page(self.playlist.initial_data)
+        seen = len(records)
+        yield records
+        while continuation:
+            records, continuation = extract_playlist_page(self._fetch_continuation(continuation), seen + 1)
+            seen += len(records)
+            yield records
+
+    def complete_record(self, record: VideoRecord) -> VideoRecord:
+        """Fills missing fields of a record from the video's own watch page (fallback only)."""
+        details = extract.initial_player_response(self.client.get_text(record.url)).get("videoDetails", {})
+        record.title = record.title or details.get("title")
+        if record.duration is None and details.get("lengthSeconds"):
+            record.duration = int(details["lengthSeconds"])
+        return record
+
+    def _complete(self, record: VideoRecord) -> VideoRecord:
+        if self.metadata_cache:
+            return self.metadata_cache.complete(record, self.complete_record)
+        return self.complete_record(record)
+
+    def metadata_cache_file(self) -> str:
+        """The video metadata cache shared by all playlists exported to output_dir."""
+        return os.path.join(self.output_dir, ".cache", METADATA_CACHE_NAME)
+
+    def iter_videos(self, use_cache: bool = False) -> Iterator[VideoRecord]:
+        """
+        Yields the playlist records in playlist order as soon as they are complete.
+
+        Records missing a field are completed on a bounded thread pool while the next
+        pages are read; at most a few records per worker are held back waiting for an
+        earlier one, so memory stays flat however long the playlist is. With use_cache,
+        missing fields are first taken from the video metadata cache (the shared one in
+        batch mode, else the output directory's), so only new videos are fetched individually.
+        If a playlist page cannot be read, the records so far are still yielded and the error is
+        kept in page_error, so callers can tell a truncated playlist from a complete one.
+        """
+        if self.playlist is None:  # Playlist.__len__ would page through the whole playlist
             print("No valid playlist found.")
             return
 
+        try:
+            self._load_playlist_page()
+            total = self.playlist.length
+        except (requests.RequestException, KeyError, IndexError, TypeError, ValueError, PytubeError):
+            total = None
+
+        owns_cache = use_cache and self.metadata_cache is None
+        if owns_cache:
+            self.metadata_cache = VideoMetadataCache(self.metadata_cache_file())
+        self.video_count = 0
+        self.page_error = None
+        seen_ids = set()
+        pending = deque()  # (record, future or None), playlist order
+        max_pending = self.workers * 4
+
         with tqdm(
-        total=len(self.playlist.videos),
+        total=total,
         desc="Fetching Videos",
         bar_format="{l_bar}{bar:20} {n_fmt}/{total_fmt} [elapsed: {elapsed} | remaining: {remaining} | avg: {rate_fmt}] {postfix}",
-        dynamic_ncols=True
-        ) as pbar:
-            for video in self.playlist.videos:
-                try:
-                    try :
-                        title = video.title
+        dynamic_ncols=True,
+        disable=not self.show_progress
+        ) as pbar, ThreadPoolExecutor(max_workers=self.workers) as executor:
+
+            def ready(limit: int) -> Iterator[VideoRecord]:
+                """Pops finished records off the front of `pending`; waits for the head while over `limit`."""
+                while pending and (len(pending) > limit or pending[0][1] is None or pending[0][1].done()):
+                    record, future = pending.popleft()
+                    try:
+                        if future is not None:
+                            future.result()
+                        pbar.set_postfix_str(f"✅ Fetched: {record.title or record.url}")
+                    except KeyError as e:
+                        pbar.set_postfix_str(f"⚠️ Missing data: {e}")
+                    except PytubeError as e:
+                        pbar.set_postfix_str(f"❗ Pytube error: {e}")
                     except Exception as e:
-                        title = video.watch_url
+                        pbar.set_postfix_str(f"❌ Error: {e}")
+                    pbar.update(1)
+                    self.video_count += 1
+                    yield record
 
-                    if not video.watch_url:
-                        pbar.set_postfix_str(f"❌ Skipping: {title}")
-                        pbar.update(1)
-                        continue
+            try:
+                for page in self.iter_playlist_pages():
+                    for record in page:
+                        if record.video_id in seen_ids:
+                            pbar.set_postfix_str(f"❌ Skipping duplicate: {record.title or record.url}")
+                            pbar.update(1)
+                            continue
+                        seen_ids.add(record.video_id)
+                        future = None if record.is_complete else executor.submit(self._complete, record)
+                        pending.append((record, future))
+                        yield from ready(max_pending)
+            except (requests.RequestException, PytubeError, ValueError, KeyError) as e:
+                self.page_error = e
+                print(f"Error reading playlist pages: {e}")
 
-                    self.video_data[title] = video.watch_url
-                    pbar.set_postfix_str(f"✅ Fetched: {title}")
-                except KeyError as e:
-                    pbar.set_postfix_str(f"⚠️ Missing data: {e}")
+            yield from ready(0)
 
-                except PytubeError as e:
-                    pbar.set_postfix_str(f"❗ Pytube error: {e}")
+        print(f"Fetched {self.video_count} videos with {self.client.request_count} requests.")
+        if owns_cache:
+            self.metadata_cache.save()
+            self.metadata_cache = None
 
-                except Exception as e:
-                    pbar.set_postfix_str(f"❌ Error: {e}")
-                finally :
-                    pbar.update(1)
+    def fetch_videos(self, use_cache: bool = False) -> None:
+        """Fetches all playlist records into video_data, in playlist order."""
+        self.video_data = list(self.iter_videos(use_cache=use_cache))
 
+    def output_path(self, extension: str) -> str:
+        """
+        Path of this playlist's output file with the given extension.
 
+        Files are named after the playlist title and id, so playlists with the same title,
+        or titles without any ASCII letters, never share a file.
+        """
+        name = self._title_stem()
+        playlist_id = self.playlist.playlist_id
+        filename = f"{name}_{playlist_id}" if name else playlist_id
+        return os.path.join(self.output_dir, f"{filename}.{extension}")
 
+    def _title_stem(self) -> str:
+        """Sanitized playlist title without the ".md" added by sanitize_filename; may be empty."""
+        filename = self.sanitize_filename(self.playlist.title)
+        return filename[:-len(".md")] if filename.endswith(".md") else filename
 
-    def export_to_markdown(self) -> str:
-        """Exports video details to a Markdown file."""
+    def read_existing_checklist(self) -> Dict[str, Tuple[bool, str]]:
+        """Checklist of the current Markdown file, falling back to the older title-only file name."""
+        markdown_file = self.output_path(MarkdownSink.extension)
+        if not os.path.exists(markdown_file) and self._title_stem():
+            markdown_file = os.path.join(self.output_dir, f"{self._title_stem()}.md")
+        return read_checklist(markdown_file)
+
+    def open_sinks(self, existing: Optional[Dict[str, Tuple[bool, str]]] = None) -> List[PlaylistSink]:
+        """
+        Opens one sink per output format.
+
+        :param existing: Checklist of the current Markdown file, merged into the new one (sync mode).
+        """
+        sinks = []
+        for extension in self.formats:
+            path = self.output_path(extension)
+            sink = MarkdownSink(path, existing) if extension == MarkdownSink.extension else SINKS[extension](path)
+            try:
+                sinks.append(sink.open())
+            except Exception as e:
+                print(f"Error creating {path}: {e}")
+                sink.abort()
+        return sinks
+
+    def _write_records(self, sink: PlaylistSink, records: Iterable[VideoRecord]) -> str:
+        """Writes already fetched records through a single sink; nothing is written for a truncated playlist."""
+        if self.page_error is not None:
+            print(f"Playlist incomplete ({self.page_error}), {sink.path} left untouched.")
+            return ""
         try:
-            markdown_file = os.path.join(self.output_dir, self.sanitize_filename(self.playlist.title))
-            with open(markdown_file, "w", encoding="utf-8") as md_file:
-                md_file.write("# Playlist\n\n")
-                for title, url in self.video_data.items():
-                    md_file.write(f"- [ ] [{title}]({url})\n")
-            print(f"Markdown file created: {markdown_file}")
-            return markdown_file
+            sink.open()
+            for record in records:
+                sink.write(record)
+            return sink.close()
         except Exception as e:
-            print(f"Error writing Markdown file: {e}")
+            print(f"Error writing {sink.path}: {e}")
+            sink.abort()
             return ""
 
+    def export_to_markdown(self) -> str:
+        """Exports the fetched video details to a Markdown file."""
+        markdown_file = self._write_records(MarkdownSink(self.output_path(MarkdownSink.extension)), self.video_data)
+        if markdown_file:
+            print(f"Markdown file created: {markdown_file}")
+        return markdown_file
+
+    def sync_markdown(self) -> str:
+        """
+        Merges the fetched videos into the existing Markdown file.
+
+        Ticked boxes are kept, new videos are added unticked in playlist order, and videos that
+        left the playlist are moved to a "Removed from playlist" section instead of being deleted.
+        """
+        markdown_file = self.output_path(MarkdownSink.extension)
+        sink = MarkdownSink(markdown_file, self.read_existing_checklist())
+        if self._write_records(sink, self.video_data):
+            print(f"Markdown file synced: {markdown_file} ({sink.added} added, {sink.removed} removed)")
+            return markdown_file
+        return ""
+
     def export_to_excel(self) -> str:
-        """Exports video details to an Excel file."""
-        try:
-            excel_file = os.path.join(self.output_dir, "playlist_output.xlsx")
-            df = pd.DataFrame({"Video Name": self.video_data.keys(), "Video URL": self.video_data.values()})
-            df.to_excel(excel_file, index=False)
+        """Exports the fetched video details to an Excel file."""
+        excel_file = self._write_records(XlsxSink(self.output_path(XlsxSink.extension)), self.video_data)
+        if excel_file:
             print(f"Excel file created: {excel_file}")
-            return excel_file
-        except Exception as e:
-            print(f"Error writing Excel file: {e}")
-            return ""
+        return excel_file
 
-    def run(self) -> None:
-        """Executes the full process of fetching and exporting the playlist data."""
-        self.fetch_videos()
+    def run(self, sync: bool = False) -> List[str]:
+        """
+        Fetches the playlist and streams the records into every output format as they arrive.
 
-        if self.video_data:
-            self.export_to_markdown()
-            if self.export_excel:
-                self.export_to_excel()
-        else:
+        :param sync: Merge into the existing Markdown file and reuse cached video metadata.
+        :returns: Paths of the written files in format order; empty if nothing was written.
+        """
+        if self.playlist is None:
+            print("No valid playlist found.")
+            return []
+        try:
+            self._load_playlist_page()
+            self.output_path(MarkdownSink.extension)  # Playlist title is read here
+            existing = self.read_existing_checklist() if sync else None
+        except (requests.RequestException, KeyError, IndexError, TypeError, ValueError, PytubeError) as e:
+            print(f"Error loading playlist: {e}")
+            return []
+
+        sinks = self.open_sinks(existing)
+        try:
+            for record in self.iter_videos(use_cache=sync):
+                for sink in list(sinks):
+                    try:
+                        sink.write(record)
+                    except Exception as e:
+                        print(f"Error writing {sink.path}: {e}")
+                        sink.abort()
+                        sinks.remove(sink)
+        except BaseException:
+            for sink in sinks:
+                sink.abort()
+            raise
+
+        if self.page_error is not None:
+            # A partial list would drop (or, in sync mode, mark as removed) every later video
+            for sink in sinks:
+                sink.abort()
+            print(f"Playlist incomplete ({self.page_error}), existing files left untouched.")
+            return []
+
+        if not self.video_count:
+            for sink in sinks:
+                sink.abort()
             print("No videos were fetched. Exiting.")
+            return []
+
+        written = []
+        for sink in sinks:
+            try:
+                path = sink.close()
+            except Exception as e:
+                print(f"Error writing {sink.path}: {e}")
+                sink.abort()
+                continue
+            written.append(path)
+            if isinstance(sink, MarkdownSink):
+                if sync:
+                    print(f"Markdown file synced: {path} ({sink.added} added, {sink.removed} removed)")
+                    continue
+            print(f"File created: {path}")
+        return written
+
+
+def read_playlist_urls(urls_file: str) -> List[str]:
+    """Reads playlist URLs from a text file, one per line; blank lines and # comments are skipped."""
+    with open(urls_file, "r", encoding="utf-8") as f:
+        return [line.strip() for line in f if line.strip() and not line.strip().startswith("#")]
+
+
+def run_batch(playlist_urls: List[str], output_dir: str = "output/youtube_playlist_to_md", sync: bool = False,
+              export_excel: bool = False, playlist_workers: int = 4, video_workers: int = 8,
+              formats: Iterable[str] = ("md",)) -> List[Tuple[str, List[str]]]:
+    """
+    Exports several playlists concurrently and writes a combined index.
+
+    All exporters share one HTTP session and one video metadata cache, so videos that appear in
+    several playlists are fetched once.
+
+    :returns: (playlist URL, written files) pairs in input order; the list is empty for failed playlists.
+    """
+    client = YouTubeClient(pool_size=playlist_workers * video_workers)
+    metadata_cache = VideoMetadataCache(os.path.join(output_dir, ".cache", METADATA_CACHE_NAME))
+    exporters = [
+        YouTubePlaylistExporter(url, output_dir=output_dir, export_excel=export_excel, client=client,
+                                workers=video_workers, metadata_cache=metadata_cache, show_progress=False,
+                                formats=formats)
+        for url in playlist_urls
+    ]
+
+    def export(exporter: YouTubePlaylistExporter) -> List[str]:
+        try:
+            return exporter.run(sync=sync)
+        except Exception as e:
+            print(f"Error exporting {exporter.playlist_url}: {e}")
+            return []
+
+    with ThreadPoolExecutor(max_workers=playlist_workers) as executor:
+        written = list(executor.map(export, exporters))
+    metadata_cache.save()
+
+    index_file = os.path.join(output_dir, "Playlists_Index.md")
+    with open(index_file, "w", encoding="utf-8") as md_file:
+        md_file.write("# Playlists\n\n")
+        for exporter, files in zip(exporters, written):
+            if files:
+                # Link the Markdown checklist when it was written, else the first other format
+                markdown_files = [path for path in files if path.endswith(f".{MarkdownSink.extension}")]
+                name = os.path.basename((markdown_files or files)[0])
+                md_file.write(f"- [{os.path.splitext(name)[0]}]({name}) ({exporter.video_count} videos)\n")
+            else:
+                md_file.write(f"- ❌ {exporter.playlist_url}\n")
+
+    exported = sum(1 for files in written if files)
+    print(f"Exported {exported}/{len(playlist_urls)} playlists, index: {index_file}")
+    print(f"HTTP requests: {client.request_count} | video cache hits: {metadata_cache.hits} | "
+          f"misses: {metadata_cache.misses}")
+    return list(zip(playlist_urls, written))
 
 
 def main():
     """Main function to execute the script."""
-    playlist_url = input("Enter Playlist URL: ").strip()
-    export_excel = input("Do you want Excel Output (y/n): ").strip().lower() == "y"
+    parser = argparse.ArgumentParser(description="Export YouTube playlists to Markdown checklists.")
+    parser.add_argument("playlist_url", nargs="?",
+                        help="Playlist URL; prompted for when neither it nor --batch is given.")
+    parser.add_argument("--batch", metavar="URLS_FILE", help="Text file with one playlist URL per line.")
+    parser.add_argument("--sync", action="store_true", help="Merge into existing Markdown files.")
+    parser.add_argument("--excel", action="store_true",
+                        help="Also export Excel files (same as adding xlsx to --formats).")
+    parser.add_argument("--formats", default="md",
+                        help=f"Comma-separated output formats, any of {', '.join(SINKS)} (default: md).")
+    args = parser.parse_args()
+    formats = [fmt.strip().lower() for fmt in args.formats.split(",") if fmt.strip()]
+    unknown = [fmt for fmt in formats if fmt not in SINKS]
+    if unknown:
+        parser.error(f"unknown format(s): {', '.join(unknown)}")
+    if args.batch:
+        run_batch(read_playlist_urls(args.batch), sync=args.sync, export_excel=args.excel, formats=formats)
+        return
+
+    playlist_url, export_excel, sync = args.playlist_url, args.excel, args.sync
+    if not playlist_url:  # Interactive: ask for whatever was not given as a flag
+        playlist_url = input("Enter Playlist URL: ").strip()
+        export_excel = export_excel or input("Do you want Excel Output (y/n): ").strip().lower() == "y"
+        sync = sync or input("Sync with the existing Markdown file (y/n): ").strip().lower() == "y"
 
-    exporter = YouTubePlaylistExporter(playlist_url, export_excel=export_excel)
-    exporter.run()
+    exporter = YouTubePlaylistExporter(playlist_url, export_excel=export_excel, formats=formats)
+    exporter.run(sync=sync)
 
 
 if __name__ == "__main__":